@@ -1,20 +1,61 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.metrics import instrument_engines
+import os
 
 SQLITE_DATABASE_URL = "sqlite:///./note.db"
+ASYNC_SQLITE_DATABASE_URL = "sqlite+aiosqlite:///./note.db"
+# Logging every statement is synchronous and slow; only turn it on to debug queries
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
 
 engine = create_engine(
-    SQLITE_DATABASE_URL, echo=True, connect_args={"check_same_thread": False}
+    SQLITE_DATABASE_URL, echo=SQL_ECHO, connect_args={"check_same_thread": False}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by async route handlers so database round trips never block the event loop
+async_engine = create_async_engine(ASYNC_SQLITE_DATABASE_URL, echo=SQL_ECHO)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL lets readers run while the other engine (or another worker) writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+event.listen(engine, "connect", _configure_sqlite)
+event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+# Count statements and time per request for /metrics
+instrument_engines([engine, async_engine.sync_engine])
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_autocommit_async_db():
+    """
+    Async session whose statements commit on their own. For handlers that write
+    with a single statement, the SQLite write lock is then held only while that
+    statement runs instead of until the handler gets back to COMMIT.
+    """
+    async with AsyncSessionLocal() as db:
+        await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        yield db
@@ -1,39 +1,64 @@
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from jose import JWTError, jwt
-from app.routers import auth, posts, comments, likes, notifications
-from app.database import Base, engine
-from app.database import SessionLocal
-from typing import Annotated
-from sqlalchemy.orm import Session
+from app.routers import auth, posts, comments, likes, notifications, images, search
+from app.database import engine
+from app.migrations import migrate
+from typing import Annotated, Optional
 from starlette import status
-from app.routers.auth import get_current_user
-from app.routers.notifications import manager
-from app.models.user import User
-# Initialize database
-Base.metadata.create_all(bind=engine)
+from app.routers.auth import get_current_user, get_user_from_token
+from app.routers.notifications import like_aggregator, manager, notification_writer
+from app.routers.posts import counter_reconciler
+from app.logging_config import configure_logging
+from app.metrics import MetricsMiddleware, metrics_response
+from app.pagination import NEXT_CURSOR_HEADER
+from app.services.connection_manager import WireEncoding
+from app.services.image_pipeline import shutdown_executor
+import logging
+
+configure_logging()
+logger = logging.getLogger("app.main")
+
+# Create or upgrade the database schema
+migrate(engine)
 
 # Create FastAPI instance
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 app.include_router(auth.router)
 app.include_router(posts.router, prefix="/posts", tags=["Posts"])
 app.include_router(comments.router, prefix="/comments", tags=["comments"])
 app.include_router(likes.router, prefix="/likes", tags=["Likes"])
 app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
+app.include_router(images.router, prefix=f"/{images.UPLOAD_DIR}", tags=["Images"])
+app.include_router(search.router, prefix="/search", tags=["Search"])
+
+@app.on_event("startup")
+async def start_notification_manager():
+    await manager.start()
+    await notification_writer.start()
+    await counter_reconciler.start()
 
-# Dependency for database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+@app.on_event("shutdown")
+async def stop_notification_manager():
+    await counter_reconciler.stop()
+    await like_aggregator.flush_all()
+    await manager.stop()
+    await notification_writer.stop()
+    shutdown_executor()
+    auth.password_hasher.shutdown()
 
-db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus metrics for this worker.
+    """
+    return metrics_response()
+
+
 @app.get("/", status_code=status.HTTP_200_OK)
 async def user(user: user_dependency):
     if user is None:
@@ -43,42 +68,47 @@ async def user(user: user_dependency):
     return {"User": user_data}
 
 
-async def get_current_user_from_token(token: str, db:db_dependency):
+async def get_current_user_from_token(token: str):
     if token is None or not token.startswith("Bearer "):
-        print("Authorization header missing or invalid")
+        logger.info("websocket rejected: authorization missing or invalid")
         raise HTTPException(
             status_code=403, detail="Authorization header missing or invalid")
-    token = token.split(" ")[1]
-    print(f"Token: {token}")
-    try:
-        payload = jwt.decode(token, '123456', algorithms=['HS256'])
-        print(f"Payload: {payload}")
-        username: str = payload.get("sub")
-        if username is None:
-            print("Invalid token: username is None")
-            raise HTTPException(status_code=403, detail="Invalid token")
-    except JWTError as e:
-        print(f"Invalid token: {e}")
-        raise HTTPException(status_code=403, detail="Invalid token")
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_from_token(token.split(" ")[1])
     if user is None:
-        print("User not found")
-        raise HTTPException(status_code=403, detail="User not found")
+        logger.info("websocket rejected: invalid token or unknown user")
+        raise HTTPException(status_code=403, detail="Invalid token")
     return user
 
 @app.websocket("/ws/{client_id}/{token}")
-async def websocket_endpoint(websocket: WebSocket, client_id: int, token: str, db: db_dependency):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    client_id: int,
+    token: str,
+    last_seen: Optional[int] = None,
+    encoding: WireEncoding = WireEncoding.JSON,
+    batch: bool = False,
+):
     # Extract the token from the URL parameter
     token = f"Bearer {token}"
-    await get_current_user_from_token(token, db)
-    await manager.connect(websocket, client_id)
+    current_user = await get_current_user_from_token(token)
+    # Index the socket under the authenticated user, not the id in the URL,
+    # so notifications can only reach their real recipient.
+    user_id = current_user.id
+    # Clients pass the last sequence number they saw to get what they missed
+    connection = await manager.connect(websocket, user_id, last_seen, encoding, batch)
+    logger.debug("websocket connected", extra={"user_id": user_id, "last_seen": last_seen, "encoding": encoding.value})
     try:
+        # Clients only send pongs to the server's pings; every message, text or
+        # binary, counts as a sign of life and against the inbound rate limit
         while True:
-            data = await websocket.receive_text()
-            await manager.send_personal_message(f"You wrote: {data}", client_id)
-            await manager.broadcast(f"Client #{client_id} says: {data}")
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, client_id)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                logger.debug("websocket disconnected", extra={"user_id": user_id})
+                break
+            if not manager.received(connection):
+                break
+    finally:
+        manager.disconnect(websocket, user_id)
 
 # Add CORS middleware
 origins = [
@@ -93,4 +123,5 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
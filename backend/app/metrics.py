@@ -0,0 +1,110 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Buckets for things counted per request or per notification
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request", ["method", "route"],
+    buckets=COUNT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent executing SQL per HTTP request", ["method", "route"]
+)
+ACTIVE_CONNECTIONS = Gauge("websocket_connections", "Open WebSocket connections on this worker")
+NOTIFICATION_FANOUT = Histogram(
+    "notification_fanout_sockets", "Local sockets a notification was queued on", buckets=COUNT_BUCKETS
+)
+NOTIFICATION_QUEUE_DEPTH = Histogram(
+    "notification_queue_depth", "Outbound queue depth a notification found when queued", buckets=COUNT_BUCKETS
+)
+NOTIFICATION_SEND_SECONDS = Histogram(
+    "notification_send_seconds", "Time from queueing a notification to writing it to the socket",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MESSAGES_SENT = Counter("notification_messages_sent", "Notifications written to sockets")
+MESSAGES_DROPPED = Counter("notification_messages_dropped", "Notifications dropped by full queues")
+FRAMES_SENT = Counter("websocket_frames_sent", "WebSocket frames written")
+FEED_CACHE_REQUESTS = Counter(
+    "feed_cache_requests", "Feed requests by cache result (hit or miss) and response status", ["result", "status"]
+)
+
+
+class QueryStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Statements run while handling the current request. Sync handlers run in a copy of
+# the context, which still points at the same QueryStats object.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def instrument_engines(engines: List[Engine]):
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Records latency and SQL statement counts per route template, so /posts/{post_id}
+    is one series no matter how many posts there are.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_query_stats.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, path, str(status_code)).observe(elapsed)
+            REQUEST_SQL_STATEMENTS.labels(method, path).observe(stats.statements)
+            REQUEST_SQL_SECONDS.labels(method, path).observe(stats.seconds)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,216 @@
+"""
+Versioned schema migrations for the SQLite store.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Each migration runs
+in its own transaction together with the version bump, so an interrupted
+upgrade resumes at the first migration that did not commit. The transaction
+starts with BEGIN IMMEDIATE, which takes SQLite's write lock before the version
+is read, so workers starting together apply each migration once. Migrations are
+written to be safe on both a fresh database, where the first one already
+creates the current schema, and on an older note.db that predates them.
+
+Upgrade a database in place from the backend folder:
+    python -m app.migrations
+"""
+import logging
+from typing import Callable, List, Tuple
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import Column, CreateColumn
+from app.database import Base
+from app.models.comment import Comment
+from app.models.like import Like
+from app.models.notification import Notification, NotificationSequence
+from app.models.post import Post
+from app.models.user import User  # noqa: F401  (registers the table)
+from app.services.search_index import create_search_index, rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits for another one that is applying a migration
+MIGRATION_LOCK_TIMEOUT = 300  # seconds
+
+
+def add_column(conn: Connection, column: Column):
+    # SQLite can only add columns that are nullable or have a default
+    existing = {row["name"] for row in inspect(conn).get_columns(column.table.name)}
+    if column.name not in existing:
+        definition = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {definition}"))
+
+
+def create_index(conn: Connection, model, name: str):
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(bind=conn, checkfirst=True)
+
+
+def create_tables(conn: Connection):
+    Base.metadata.create_all(bind=conn)
+
+
+def add_sequence_and_counter_columns(conn: Connection):
+    add_column(conn, Notification.__table__.c.seq)
+    add_column(conn, Post.__table__.c.like_count)
+    add_column(conn, Post.__table__.c.comment_count)
+
+
+def add_hot_query_indexes(conn: Connection):
+    create_index(conn, Post, "ix_posts_created_at_id")
+    create_index(conn, Comment, "ix_comments_post_id_created_at_id")
+    create_index(conn, Notification, "ix_notifications_user_id_created_at_id")
+    create_index(conn, Notification, "ix_notifications_user_id_is_read_id")
+    create_index(conn, Notification, "ix_notifications_user_id_seq")
+
+
+def unique_likes(conn: Connection):
+    # Racing requests could insert the same like twice; keep the oldest row.
+    # The counter reconciler fixes like_count on its startup run.
+    removed = conn.execute(text(
+        "DELETE FROM likes WHERE id NOT IN (SELECT MIN(id) FROM likes GROUP BY post_id, user_id)"
+    )).rowcount
+    if removed:
+        logger.warning("removed duplicate likes", extra={"rows": removed})
+    # The unique index also answers lookups by user and post, so the old one goes
+    conn.execute(text("DROP INDEX IF EXISTS ix_likes_user_id_post_id"))
+    create_index(conn, Like, "ux_likes_post_id_user_id")
+
+
+def counter_triggers(conn: Connection):
+    # Keep posts.like_count and posts.comment_count in step inside SQLite, so a
+    # like is one INSERT or DELETE and an ignored duplicate changes nothing
+    for table, column in (("likes", "like_count"), ("comments", "comment_count")):
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} BEGIN "
+            f"UPDATE posts SET {column} = {column} + 1 WHERE id = NEW.post_id; END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} BEGIN "
+            f"UPDATE posts SET {column} = {column} - 1 WHERE id = OLD.post_id; END"
+        ))
+
+
+def structured_notifications(conn: Connection):
+    for name in ("action", "actor_id", "post_id", "comment_id"):
+        add_column(conn, Notification.__table__.c[name])
+    # Fill the columns of older rows from their JSON payload. Payloads name the
+    # actor and not the comment, so those are looked up; a comment is matched
+    # on its post, author and text.
+    conn.execute(text("""
+        UPDATE notifications SET
+            action = json_extract(message, '$.action'),
+            post_id = json_extract(message, '$.post_id'),
+            actor_id = (SELECT users.id FROM users WHERE users.username = json_extract(message, '$.from'))
+        WHERE action IS NULL AND json_valid(message)
+    """))
+    conn.execute(text("""
+        UPDATE notifications SET comment_id = (
+            SELECT MAX(comments.id) FROM comments
+            WHERE comments.post_id = notifications.post_id
+              AND comments.user_id = notifications.actor_id
+              AND comments.content = json_extract(notifications.message, '$.content')
+        )
+        WHERE action = 'comment' AND comment_id IS NULL
+    """))
+    create_index(conn, Notification, "ix_notifications_user_id_action_created_at_id")
+    create_index(conn, Notification, "ix_notifications_user_id_post_id_action_created_at_id")
+
+
+def full_text_search(conn: Connection):
+    create_search_index(conn)
+    # Index the posts and comments written before the triggers existed
+    rebuild_search_index(conn)
+
+
+def notification_sequences(conn: Connection):
+    NotificationSequence.__table__.create(bind=conn, checkfirst=True)
+    # Continue from the numbers already stored
+    conn.execute(text("""
+        INSERT INTO notification_sequences (user_id, last_seq)
+        SELECT user_id, MAX(seq) FROM notifications
+        WHERE seq IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)
+    """))
+
+
+def unlikes_read(conn: Connection):
+    # Clients never show unlike summaries as unread; stop counting older ones
+    conn.execute(text("UPDATE notifications SET is_read = 1 WHERE action = 'unlike' AND is_read = 0"))
+
+
+def since_id_indexes(conn: Connection):
+    create_index(conn, Notification, "ix_notifications_user_id_id")
+    create_index(conn, Notification, "ix_notifications_user_id_action_id")
+
+
+# (version, description, migration), in order. Append new migrations; never
+# edit or reorder ones that have shipped.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", create_tables),
+    (2, "add notification sequence numbers and post counters", add_sequence_and_counter_columns),
+    (3, "index feed, comment and notification pages", add_hot_query_indexes),
+    (4, "one like per user and post", unique_likes),
+    (5, "maintain post counters with triggers", counter_triggers),
+    (6, "structured notification columns", structured_notifications),
+    (7, "full-text search over posts and comments", full_text_search),
+    (8, "per-user notification sequence counters", notification_sequences),
+    (9, "store unlike notifications as read", unlikes_read),
+    (10, "index notification lists bounded by id", since_id_indexes),
+]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _locking_engine(engine: Engine) -> Engine:
+    # pysqlite commits DDL on its own and starts transactions with a deferred
+    # BEGIN. SQLAlchemy's documented recipe hands transaction control back to
+    # SQLAlchemy; BEGIN IMMEDIATE then locks the database for the transaction.
+    migration_engine = create_engine(
+        engine.url, poolclass=NullPool, connect_args={"timeout": MIGRATION_LOCK_TIMEOUT}
+    )
+
+    @event.listens_for(migration_engine, "connect")
+    def _autocommit_driver(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(migration_engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return migration_engine
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Apply pending migrations and return the versions applied.
+    """
+    applied = []
+    migration_engine = _locking_engine(engine)
+    try:
+        for version, description, migration in MIGRATIONS:
+            with migration_engine.begin() as conn:
+                # Read under the lock: another worker may have just applied it
+                if current_version(conn) >= version:
+                    continue
+                migration(conn)
+                # PRAGMA takes no bound parameters; version is an int from the list above
+                conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+            logger.info("applied migration", extra={"version": version, "migration": description})
+            applied.append(version)
+    finally:
+        migration_engine.dispose()
+    return applied
+
+
+if __name__ == "__main__":
+    from app.database import engine
+    from app.logging_config import configure_logging
+
+    configure_logging()
+    with engine.connect() as conn:
+        before = current_version(conn)
+    applied = migrate(engine)
+    print(f"schema version {before} -> {MIGRATIONS[-1][0]}, applied {applied or 'nothing'}")
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Keyset pagination of a post's comments
+        Index("ix_comments_post_id_created_at_id", "post_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        # One like per user and post; also answers "has this user liked the
+        # post" for the feed and like/unlike, and counts likes per post
+        Index("ux_likes_post_id_user_id", "post_id", "user_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     post_id = Column(Integer, ForeignKey("posts.id"))
@@ -1,11 +1,43 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Keyset pagination of a user's notifications
+        Index("ix_notifications_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Unread counts and mark-read ranges
+        Index("ix_notifications_user_id_is_read_id", "user_id", "is_read", "id"),
+        # Replaying what a reconnecting client missed
+        Index("ix_notifications_user_id_seq", "user_id", "seq"),
+        # Filtered lists: one kind of notification, or one post's
+        Index("ix_notifications_user_id_action_created_at_id", "user_id", "action", "created_at", "id"),
+        Index("ix_notifications_user_id_post_id_action_created_at_id", "user_id", "post_id", "action", "created_at", "id"),
+        # Lists bounded by since_id, with and without an action filter
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        Index("ix_notifications_user_id_action_id", "user_id", "action", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
+    # The pushed JSON payload, replayed as is to reconnecting clients
     message = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, server_default=func.now())
-    is_read = Column(Boolean, default=False)
\ No newline at end of file
+    is_read = Column(Boolean, default=False)
+    # Per-user push sequence number, see ReplayBuffer
+    seq = Column(Integer, nullable=True)
+    # What the payload is about, as columns that can be filtered and indexed
+    action = Column(String, nullable=True)
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=True)
+    comment_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
+
+
+class NotificationSequence(Base):
+    """
+    Last push sequence number handed out per user, for workers that share
+    users through a backplane and so cannot number pushes in memory.
+    """
+    __tablename__ = "notification_sequences"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_seq = Column(Integer, nullable=False)
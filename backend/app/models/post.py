@@ -1,15 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination of the feed
+        Index("ix_posts_created_at_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     content = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     image_url = Column(String, nullable=True)
+    # Kept in step by triggers on likes and comments (app/migrations.py);
+    # CounterReconciler repairs drift
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     comments = relationship("Comment", back_populates="post")
     likes = relationship("Like", back_populates="post")
\ No newline at end of file
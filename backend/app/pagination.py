@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import String, literal, tuple_
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, kind: str, row_id: int) -> str:
+    payload = json.dumps([rank, kind, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, kind, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), str(kind), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _stored_datetime(value: datetime):
+    # SQLite keeps DATETIME as text. Rows filled by CURRENT_TIMESTAMP have no
+    # fractional seconds while SQLAlchemy writes six digits, so compare against
+    # the same textual form the row was stored in.
+    if value.microsecond:
+        text = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    else:
+        text = value.strftime("%Y-%m-%d %H:%M:%S")
+    return literal(text, String)
+
+
+def keyset_page(query, created_at_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Newest-first page of a query keyed on (created_at, id), starting after the cursor.
+    One extra row is fetched to know whether a next page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_at_column, id_column) < tuple_(_stored_datetime(created_at), row_id))
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def id_page(query, id_column, cursor: Optional[str], limit: int):
+    """
+    Newest-first page of a query keyed on id alone, for lists bounded by id.
+    Takes the same cursors as keyset_page and only uses their id.
+    """
+    if cursor:
+        _, row_id = decode_cursor(cursor)
+        query = query.filter(id_column < row_id)
+    return query.order_by(id_column.desc()).limit(limit + 1)
+
+
+def set_next_cursor(response: Response, rows: list, limit: int, key=lambda row: (row.created_at, row.id)) -> list:
+    """
+    Trim the look-ahead row from a keyset page and expose the next cursor in a header.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
@@ -1,19 +1,31 @@
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal, get_async_db
 from app.models.user import User
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from app.schemas.user import UserCreate, Token
+from app.schemas.user import UserCreate, Token, UserResponse
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+from app.services.user_cache import UserCache
+import logging
+
+logger = logging.getLogger(__name__)
 
 # JWT Settings
 SECRET_KEY = "123456"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 1 day
+# Verified token -> user snapshot cache, so authenticated requests skip the users query
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 60  # seconds
+# bcrypt runs off the event loop with bounded parallelism and a bounded wait queue
+PASSWORD_HASH_CONCURRENCY = 2
+PASSWORD_HASH_MAX_PENDING = 64
 
 router = APIRouter(
     prefix="/auth",
@@ -21,45 +33,56 @@ router = APIRouter(
 )
 
 bycrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    bycrypt_context,
+    max_concurrency=PASSWORD_HASH_CONCURRENCY,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+)
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
+user_cache = UserCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
 
-# Dependency for database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
 
-db_dependency = Annotated[Session, Depends(get_db)]
+busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many sign-in attempts in progress, please retry",
+    headers={"Retry-After": "1"},
+)
 
 # # Sign-up Endpoint
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def sign_up(db: db_dependency, user: UserCreate):
     # Check if user already exists
-    if db.query(User).filter(User.username == user.username).first():
+    if await db.scalar(select(User.id).where(User.username == user.username)):
         raise HTTPException(status_code=400, detail="Username already exists")
-    if db.query(User).filter(User.email == user.email).first():
+    if await db.scalar(select(User.id).where(User.email == user.email)):
         raise HTTPException(status_code=400, detail="Email already exists")
 
     # Hash the password and create the user
-    hashed_password = bycrypt_context.hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise busy_exception
     new_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
+    await db.commit()
 
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: db_dependency
 ) -> Token:
-    print(form_data)
-    user = authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password, db)
+    except PasswordHasherBusy:
+        logger.warning("login rejected: password hasher busy", extra={"username": form_data.username})
+        raise busy_exception
     if not user:
+        logger.info("login failed", extra={"username": form_data.username})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -69,11 +92,15 @@ async def login_for_access_token(
     access_token = create_access_token(user.username, user.id, user.email, access_token_expires)
     return Token(access_token=access_token, token_type="bearer")
 
-def authenticate_user(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = (await db.execute(
+        select(User.id, User.username, User.email, User.hashed_password).where(User.username == username)
+    )).first()
+    # Give the connection back to the pool while bcrypt runs
+    await db.rollback()
     if not user:
         return False
-    if not bycrypt_context.verify(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
@@ -85,20 +112,42 @@ def create_access_token(username: str, user_id: int, email: str, expires_delta:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db_dependency) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def get_user_from_token(token: str) -> Optional[UserResponse]:
+    """
+    Resolve an access token to a user snapshot, or None if it is invalid.
+    Verified tokens are cached, so repeat calls skip both the JWT check and the users query.
+    """
+    user = user_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        db_user = await db.scalar(select(User).where(User.username == username))
+    if db_user is None:
+        return None
+    user = UserResponse.model_validate(db_user, from_attributes=True)
+    user_cache.put(token, user, token_expires_at=payload.get("exp"))
+    return user
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]) -> UserResponse:
+    user = await get_user_from_token(token)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate_user(target.id)
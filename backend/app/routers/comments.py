@@ -1,47 +1,86 @@
-from fastapi import APIRouter, Depends
-from typing import Annotated
+from fastapi import APIRouter, Depends, Query, Response
+from typing import Annotated, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import get_async_db, get_db
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, keyset_page, set_next_cursor
 from app.models.post import Post
 from app.models.comment import Comment
 from app.models.user import User
 from app.schemas.comment import CommentCreate, CommentResponse
 from app.routers.auth import get_current_user
 from app.routers.notifications import notify_comment
+from app.services.comment_cache import CommentCache, page_of
+
+# Newest comments of the most recently read posts are served from memory. The
+# window is one longer than the largest page, so a full page still knows
+# whether another one follows.
+COMMENT_CACHE_POSTS = 1000
+COMMENT_CACHE_WINDOW = MAX_PAGE_SIZE + 1
+COMMENT_CACHE_TTL = 30  # seconds
+comment_cache = CommentCache(max_posts=COMMENT_CACHE_POSTS, window=COMMENT_CACHE_WINDOW, ttl=COMMENT_CACHE_TTL)
 
 router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 db_dependency = Annotated[Session, Depends(get_db)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.post("/", response_model=CommentResponse)
-async def create_comment(comment: CommentCreate, db: db_dependency, user: user_dependency):
+async def create_comment(comment: CommentCreate, db: async_db_dependency, user: user_dependency):
     new_comment = Comment(content=comment.content, post_id=comment.post_id, user_id=user.id)
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.commit()
+    await db.refresh(new_comment)
+    comment_cache.add(comment.post_id, {
+        "id": new_comment.id,
+        "content": new_comment.content,
+        "user_id": new_comment.user_id,
+        "post_id": new_comment.post_id,
+        "created_at": new_comment.created_at,
+        "username": user.username,
+    })
 
     # Send notifications for new comments to author of the post
-    post = db.query(Post).filter(Post.id == comment.post_id).first()
-    if post:
-        await notify_comment(new_comment, user.username, post.user_id, db)
+    post_author_id = await db.scalar(select(Post.user_id).where(Post.id == comment.post_id))
+    if post_author_id is not None:
+        await notify_comment(new_comment, user.username, post_author_id)
 
     return new_comment
 
+def load_comments(db: Session, post_id: int, cursor: Optional[str], limit: int) -> list[dict]:
+    """
+    One keyset page of a post's comments joined with their authors, plus the look-ahead row.
+    """
+    query = (
+        db.query(Comment.id, Comment.content, Comment.user_id, Comment.post_id, Comment.created_at, User.username)
+        .outerjoin(User, User.id == Comment.user_id)
+        .filter(Comment.post_id == post_id)
+    )
+    rows = keyset_page(query, Comment.created_at, Comment.id, cursor, limit).all()
+    return [{**row._asdict(), "username": row.username or "Unknown"} for row in rows]
+
+
 @router.get("/{post_id}", response_model=list[CommentResponse])
-def get_comments(post_id: int, db: db_dependency):
-    comments = db.query(Comment).order_by(Comment.created_at.desc()).filter(Comment.post_id == post_id).all()
-    for comment in comments:
-        user = db.query(User).filter(User.id == comment.user_id).first()
-        comment.username = user.username if user else "Unknown"
-    return comments
+def get_comments(
+    post_id: int,
+    db: db_dependency,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+):
+    after = decode_cursor(cursor) if cursor else None
+    comments = comment_cache.page(post_id, after, limit)
+    if comments is None and after is None:
+        # Read the whole cacheable window, then answer from it
+        version = comment_cache.version(post_id)
+        window = load_comments(db, post_id, None, COMMENT_CACHE_WINDOW)
+        complete = len(window) <= COMMENT_CACHE_WINDOW
+        comment_cache.put(post_id, window, complete, version)
+        comments = page_of(window[:COMMENT_CACHE_WINDOW], complete, None, limit)
+    if comments is None:
+        comments = load_comments(db, post_id, cursor, limit)
+    return set_next_cursor(response, comments, limit, key=lambda comment: (comment["created_at"], comment["id"]))
@@ -0,0 +1,80 @@
+import os
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from app.services.image_pipeline import IMAGE_EXTENSIONS, UPLOAD_DIR, pick_variant
+# Uploaded files are named after their content and never rewritten, so clients may cache them for good
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+router = APIRouter()
+
+
+def image_url_for(filename: str) -> str:
+    return f"/{UPLOAD_DIR}/{filename}"
+
+
+def image_path(image_url: Optional[str]) -> Optional[str]:
+    """
+    Map a stored image URL to its file under UPLOAD_DIR. Older rows may use
+    Windows separators, and only the file name is trusted.
+    """
+    if not image_url:
+        return None
+    filename = os.path.basename(image_url.replace("\\", "/"))
+    if not filename:
+        return None
+    return os.path.join(UPLOAD_DIR, filename)
+
+
+def _security_headers(file_path: str) -> dict:
+    # Browsers must not sniff uploads into HTML, and files stored before uploads
+    # were limited to images are downloaded rather than rendered
+    headers = {"x-content-type-options": "nosniff"}
+    if os.path.splitext(file_path)[1].lower() not in IMAGE_EXTENSIONS:
+        headers["content-disposition"] = "attachment"
+    return headers
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/{filename}")
+def get_image(filename: str, request: Request, w: Optional[int] = Query(None, ge=1, le=4096)):
+    """
+    Serve an uploaded image with ETag/Last-Modified validators and Range support.
+    With `w`, the smallest resized variant at least that wide is returned instead.
+    """
+    file_path = image_path(filename)
+    if file_path is None or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    file_path = pick_variant(os.path.basename(file_path), w)
+    stat_result = os.stat(file_path)
+    security_headers = _security_headers(file_path)
+    response = FileResponse(
+        file_path,
+        stat_result=stat_result,
+        headers={"cache-control": IMAGE_CACHE_CONTROL, **security_headers},
+    )
+    if _not_modified(request, response.headers["etag"], stat_result):
+        return Response(
+            status_code=304,
+            headers={
+                "etag": response.headers["etag"],
+                "last-modified": response.headers["last-modified"],
+                "cache-control": IMAGE_CACHE_CONTROL,
+                **security_headers,
+            },
+        )
+    return response
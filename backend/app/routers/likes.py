@@ -1,56 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Annotated
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Annotated, List
+from sqlalchemy import delete, exists, literal, literal_column, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_autocommit_async_db
+from app.pagination import MAX_PAGE_SIZE
 from app.models.post import Post
 from app.models.like import Like
 from app.routers.auth import get_current_user
-from app.routers.notifications import notify_like, notify_unlike
-from app.schemas.like import LikeResponse, LikeCreate
+from app.routers.notifications import feed_cache, notify_like, notify_unlike
+from app.schemas.like import LikeResponse, LikeCreate, LikeState
 
 router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+# Like and unlike are single statements, each committed as it runs
+autocommit_db_dependency = Annotated[AsyncSession, Depends(get_autocommit_async_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+
+# Author of the post a like belongs to, read in the RETURNING clause of the
+# write for the notification. SQLite renders RETURNING columns without their
+# table, so the like's post_id is spelled out to keep it from resolving to posts.
+POST_AUTHOR = select(Post.user_id).where(Post.id == literal_column("likes.post_id")).scalar_subquery()
+
+
 @router.post("/", response_model=LikeResponse)
-async def like_post(like: LikeCreate, db: db_dependency, user: user_dependency):
-    post = db.query(Post).filter(Post.id == like.post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    existing_like = db.query(Like).filter(Like.post_id == like.post_id, Like.user_id == user.id).first()
-    if existing_like:
-        raise HTTPException(status_code=400, detail="Already liked this post")
-    new_like = Like(post_id=like.post_id, user_id=user.id)
-    db.add(new_like)
-    db.commit()
-    db.refresh(new_like)
+async def like_post(like: LikeCreate, db: autocommit_db_dependency, user: user_dependency):
+    """
+    Like a post. Liking it again returns the existing like.
+    """
+    # One statement: the row is only inserted if the post exists, a repeat is
+    # ignored by the unique index and a trigger bumps posts.like_count
+    inserted = (await db.execute(
+        insert(Like)
+        .from_select(["user_id", "post_id"], select(literal(user.id), Post.id).where(Post.id == like.post_id))
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        .returning(Like.id, POST_AUTHOR)
+    )).first()
+    if inserted is None:
+        like_id = await db.scalar(select(Like.id).where(Like.post_id == like.post_id, Like.user_id == user.id))
+        if like_id is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return {"id": like_id, "user_id": user.id, "post_id": like.post_id}
+    like_id, post_author_id = inserted
+    feed_cache.set_liked(user.id, like.post_id, True)
 
     # Send notifications for like to author of the post
-    await notify_like(user.username, post.user_id, like.post_id, db)
-    return new_like
+    await notify_like(user.id, user.username, post_author_id, like.post_id)
+    return {"id": like_id, "user_id": user.id, "post_id": like.post_id}
 
 @router.delete("/{post_id}", response_model=dict)
-async def unlike_post(post_id: int, db: db_dependency, user: user_dependency):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    like = db.query(Like).filter(Like.post_id == post_id, Like.user_id == user.id).first()
-    if not like:
-        raise HTTPException(status_code=404, detail="Like not found")
-    db.delete(like)
-    db.commit()
+async def unlike_post(post_id: int, db: autocommit_db_dependency, user: user_dependency):
+    """
+    Remove the current user's like. Unliking a post that is not liked succeeds.
+    """
+    deleted = (await db.execute(
+        delete(Like)
+        .where(Like.post_id == post_id, Like.user_id == user.id)
+        .returning(POST_AUTHOR)
+    )).first()
+    if deleted is None:
+        if await db.scalar(select(Post.id).where(Post.id == post_id)) is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return {"detail": "Unliked successfully"}
+    feed_cache.set_liked(user.id, post_id, False)
 
     # Send notifications unlike to author of the post
-    await notify_unlike(user.username, post.user_id, post_id, db)
-    return {"detail": "Unliked successfully"}
\ No newline at end of file
+    await notify_unlike(user.id, user.username, deleted[0], post_id)
+    return {"detail": "Unliked successfully"}
+
+@router.get("/state", response_model=List[LikeState])
+async def get_like_states(
+    db: autocommit_db_dependency,
+    user: user_dependency,
+    post_ids: List[int] = Query(..., min_length=1, max_length=MAX_PAGE_SIZE),
+):
+    """
+    Like counts and whether the current user liked each post, for a page of
+    post ids (`?post_ids=1&post_ids=2`) in one query. Unknown ids are left out.
+    """
+    is_liked = exists().where(Like.post_id == Post.id, Like.user_id == user.id)
+    rows = await db.execute(select(Post.id, Post.like_count, is_liked).where(Post.id.in_(post_ids)))
+    return [
+        {"post_id": post_id, "total_likes": like_count, "is_liked_by_current_user": liked}
+        for post_id, like_count, liked in rows
+    ]
@@ -1,111 +1,236 @@
-from fastapi import APIRouter, Depends, WebSocket
-from typing import Annotated, Dict, List
-from app.database import get_db
+from fastapi import APIRouter, Depends, Query, Response
+from typing import Annotated, List, Optional
+from app.database import SessionLocal, get_async_db, get_db
+from app.pagination import MAX_PAGE_SIZE, id_page, keyset_page, set_next_cursor
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.notification import Notification
 from app.routers.auth import get_current_user
-from app.schemas.notification import NotificationResponse
+from app.schemas.notification import MarkReadRequest, MarkReadResponse, NotificationResponse, UnreadCountResponse
 from app.schemas.comment import CommentResponse
+from app.services.backplane import create_backplane
+from app.services.connection_manager import ConnectionManager, OverflowPolicy
+from app.services.feed_cache import FeedCache
+from app.services.like_aggregator import Actor, LikeAggregator, summarize
+from app.services.notification_writer import Durability, NotificationWriter
+from app.services.replay_buffer import ReplayBuffer
+from app.services.unread_counter import UnreadCounter
 import json
+import os
+
+
+# Outbound queue settings for each WebSocket connection
+MAX_QUEUE_SIZE = 100
+OVERFLOW_POLICY = OverflowPolicy.DROP_OLDEST
+# Clients connecting with ?batch=true get pushes packed into one frame per window
+BATCH_WINDOW = 0.005  # seconds
+MAX_BATCH = 50
+# Quiet sockets are pinged and must answer within IDLE_TIMEOUT; clients only send
+# pongs, so a handful of messages per second is plenty
+HEARTBEAT_INTERVAL = 25.0  # seconds
+IDLE_TIMEOUT = 60.0  # seconds
+INBOUND_RATE = 5.0  # messages per second
+INBOUND_BURST = 20
+# "local" for a single worker; "sqlite:///./backplane.db" to share notifications
+# between uvicorn workers on the same host
+NOTIFICATION_BACKPLANE = os.getenv("NOTIFICATION_BACKPLANE", "local")
+# Recent pushes kept per user for clients that reconnect with last_seen. Larger
+# gaps are answered with a resync frame and the client reloads over HTTP.
+REPLAY_BUFFER_SIZE = 100
+REPLAY_MAX_USERS = 10000
+# Workers sharing a backplane number pushes through SQLite, a single worker in memory
+replay_buffer = ReplayBuffer(
+    size=REPLAY_BUFFER_SIZE,
+    max_users=REPLAY_MAX_USERS,
+    max_replay=MAX_QUEUE_SIZE,
+    shared_sequences=NOTIFICATION_BACKPLANE != "local",
+)
+
+manager = ConnectionManager(
+    max_queue_size=MAX_QUEUE_SIZE,
+    overflow_policy=OVERFLOW_POLICY,
+    backplane=create_backplane(NOTIFICATION_BACKPLANE),
+    history=replay_buffer,
+    batch_window=BATCH_WINDOW,
+    max_batch=MAX_BATCH,
+    heartbeat_interval=HEARTBEAT_INTERVAL,
+    idle_timeout=IDLE_TIMEOUT,
+    inbound_rate=INBOUND_RATE,
+    inbound_burst=INBOUND_BURST,
+)
+# Unread badge counts, reloaded from the database at most this often
+UNREAD_COUNT_TTL = 60  # seconds
+UNREAD_COUNT_USERS = 10000
+unread_counter = UnreadCounter(ttl=UNREAD_COUNT_TTL, max_users=UNREAD_COUNT_USERS)
+
+# Notification rows are written behind the live push in batches
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_FLUSH_INTERVAL = 0.05  # seconds
+# flush_before_ack covers comment notifications. Like and unlike summaries are
+# written when their aggregation window closes, after the request returned.
+NOTIFICATION_DURABILITY = Durability(os.getenv("NOTIFICATION_DURABILITY", Durability.ASYNC.value))
+
+notification_writer = NotificationWriter(
+    SessionLocal,
+    batch_size=NOTIFICATION_BATCH_SIZE,
+    flush_interval=NOTIFICATION_FLUSH_INTERVAL,
+    durability=NOTIFICATION_DURABILITY,
+    on_written=unread_counter.record_written,
+)
+# Feed pages shared by all viewers plus each viewer's liked posts. The events
+# that notify about a post also update its cached counters.
+FEED_CACHE_PAGES = 1000
+FEED_CACHE_VIEWERS = 10000
+FEED_CACHE_TTL = 5  # seconds, bounds staleness from writes on other workers
+feed_cache = FeedCache(max_pages=FEED_CACHE_PAGES, max_viewers=FEED_CACHE_VIEWERS, ttl=FEED_CACHE_TTL)
+
+# Stored as already read: clients never show these as unread, so they must not
+# count towards the badge
+READ_ON_ARRIVAL_ACTIONS = frozenset({"unlike"})
+
+# Likes and unlikes on a post are coalesced into one notification per window
+LIKE_AGGREGATION_WINDOW = 2.0  # seconds, 0 disables aggregation
+MAX_ACTORS_LISTED = 10
 
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.client_connections: Dict[int, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, client_id: int):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        self.client_connections[client_id] = websocket
-
-    def disconnect(self, websocket: WebSocket, client_id: int):
-        self.active_connections.remove(websocket)
-        if client_id in self.client_connections:
-            del self.client_connections[client_id]
-
-    async def send_personal_message(self, message: str, client_id: int):
-        websocket = self.client_connections.get(client_id)
-        if websocket:
-            await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-
-manager = ConnectionManager()
 router = APIRouter()
 user_dependency = Annotated[dict, Depends(get_current_user)]
 db_dependency = Annotated[Session, Depends(get_db)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+async def dispatch_notification(client_id: int, data: dict, key: Optional[str] = None):
+    """
+    Push a notification to the recipient's sockets and queue its stored row.
+    """
+    seq = await replay_buffer.next_seq(client_id)
+    # The pushed payload and the stored row's columns come from the same record
+    message = json.dumps({**data, "seq": seq})
+    replay_buffer.record(client_id, seq, message)
+    await manager.send_to_user(message, client_id, key=key)
+    await notification_writer.enqueue(
+        client_id, message, seq=seq, record=data, is_read=data.get("action") in READ_ON_ARRIVAL_ACTIONS
+    )
 
 
-async def notify_comment(comment: CommentResponse, username: str, client_id: int, db: db_dependency):
+async def notify_comment(comment: CommentResponse, username: str, client_id: int):
+    feed_cache.count_changed(comment.post_id, comments=1)
     data = {
         "action": "comment",
         "content": comment.content,
         "user_id": client_id,
         "from": username,
+        "actor_id": comment.user_id,
         "post_id": comment.post_id,
+        "comment_id": comment.id,
         "created_at": str(comment.created_at),
     }
-    message = json.dumps(data)
-    notification = Notification(
-        user_id=client_id,
-        message=message
-    )
-    db.add(notification)
-    db.commit()
-    await manager.broadcast(message)
+    await dispatch_notification(client_id, data)
     return {"message": "Notification sent"}
 
 
-async def notify_like(username: str, client_id: int, post_id: int, db: db_dependency):
+async def emit_like_summary(client_id: int, post_id: int, action: str, actors: List[Actor]):
+    names = [name for _, name in actors]
     data = {
-        "action": "like",
-        "content": "like",
+        "action": action,
+        "content": summarize(names, action),
         "user_id": client_id,
-        "from": username,
+        "from": names[-1],
+        "actor_id": actors[-1][0],
         "post_id": post_id,
         "created_at": "",
+        "count": len(actors),
+        "actors": names[-MAX_ACTORS_LISTED:],
     }
-    message = json.dumps(data)
-    notification = Notification(
-        user_id=client_id,
-        message=message
-    )
-    db.add(notification)
-    db.commit()
-    await manager.broadcast(message)
+    await dispatch_notification(client_id, data, key=f"{action}:{post_id}")
+
+
+like_aggregator = LikeAggregator(emit_like_summary, window=LIKE_AGGREGATION_WINDOW)
+
+
+async def notify_like(actor_id: int, username: str, client_id: int, post_id: int):
+    feed_cache.count_changed(post_id, likes=1)
+    await like_aggregator.add(client_id, post_id, (actor_id, username), "like")
     return {"message": "Notification sent"}
 
-async def notify_unlike(username: str, client_id: int, post_id: int, db: db_dependency):
-    data = {
-        "action": "unlike",
-        "content": "unlike",
-        "user_id": client_id,
-        "from": username,
-        "post_id": post_id,
-        "created_at": "",
-    }
-    message = json.dumps(data)
-    notification = Notification(
-        user_id=client_id,
-        message=message
-    )
-    db.add(notification)
-    db.commit()
-    await manager.broadcast(message)
+async def notify_unlike(actor_id: int, username: str, client_id: int, post_id: int):
+    feed_cache.count_changed(post_id, likes=-1)
+    await like_aggregator.add(client_id, post_id, (actor_id, username), "unlike")
     return {"message": "Notification sent"}
 
 
-@router.get("/notifications/count")
-async def get_notification_count():
-    return {"count": len(manager.active_connections)}
+@router.get("/notifications/count", response_model=UnreadCountResponse)
+async def get_notification_count(user: user_dependency):
+    """
+    Number of unread notifications for the badge, served from memory.
+    """
+    return {"count": await unread_counter.get(user.id)}
+
+
+@router.post("/mark-read", response_model=MarkReadResponse)
+async def mark_notifications_read(body: MarkReadRequest, db: async_db_dependency, user: user_dependency):
+    """
+    Mark every notification of the user up to and including `up_to_id` as read.
+    """
+    result = await db.execute(
+        update(Notification)
+        .where(
+            Notification.user_id == user.id,
+            Notification.is_read.is_(False),
+            Notification.id <= body.up_to_id,
+        )
+        .values(is_read=True)
+    )
+    await db.commit()
+    unread_counter.add(user.id, -result.rowcount)
+    return {"updated": result.rowcount, "unread": await unread_counter.get(user.id)}
+
+
+@router.get("/stats")
+async def get_connection_stats():
+    return {
+        **manager.queue_metrics(),
+        "like_events_received": like_aggregator.events_received,
+        "like_events_cancelled": like_aggregator.events_cancelled,
+        "like_summaries_failed": like_aggregator.emits_failed,
+        "notifications_buffered": len(notification_writer.buffer),
+        "notifications_written": notification_writer.rows_written,
+        "notification_flushes": notification_writer.flushes,
+        "replayed_from_memory": replay_buffer.replayed_from_memory,
+        "replayed_from_db": replay_buffer.replayed_from_db,
+        "replay_resyncs": replay_buffer.resyncs,
+    }
 
 
 @router.get("/", response_model=list[NotificationResponse])
-def get_comments(db: db_dependency, user: user_dependency):
-    comments = db.query(Notification).order_by(
-        Notification.created_at.desc()).filter(Notification.user_id == user.id).all()
-    return comments
+def get_comments(
+    db: db_dependency,
+    user: user_dependency,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    unread_only: bool = False,
+    action: Optional[str] = None,
+    post_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+):
+    """
+    The user's notifications, newest first. `action` and `post_id` narrow the
+    list using the indexed columns, `since_id` keeps only newer
+    notifications and orders them by id.
+    """
+    query = db.query(Notification).filter(Notification.user_id == user.id)
+    if unread_only:
+        query = query.filter(Notification.is_read.is_(False))
+    if action is not None:
+        query = query.filter(Notification.action == action)
+    if post_id is not None:
+        query = query.filter(Notification.post_id == post_id)
+    if since_id is not None:
+        # Bounded on id, so the page is ordered on id as well and the bound is
+        # part of the index search instead of a filter over older rows
+        query = query.filter(Notification.id > since_id)
+        comments = id_page(query, Notification.id, cursor, limit).all()
+    else:
+        comments = keyset_page(query, Notification.created_at, Notification.id, cursor, limit).all()
+    return set_next_cursor(response, comments, limit)
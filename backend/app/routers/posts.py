@@ -1,39 +1,43 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
 from typing import Annotated, List, Optional
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import SessionLocal, get_async_db, get_db
+from app.metrics import FEED_CACHE_REQUESTS
+from app.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, keyset_page
 from app.models.comment import Comment
 from app.models.like import Like
 from app.models.post import Post
 from app.models.user import User
 from app.schemas.post import GetPostResponse, PostResponse
 from app.routers.auth import get_current_user
-import shutil
+from app.routers.comments import comment_cache
+from app.routers.images import image_path, image_url_for
+from app.routers.notifications import feed_cache
+from app.services.counter_reconciler import CounterReconciler
+from app.services.feed_cache import FeedPage, etag_matches, page_etag
+from app.services.image_pipeline import IMAGE_EXTENSIONS, InvalidUpload, delete_image_files, store_upload
 import os
-import uuid
-import base64
+
+# Recount likes and comments per post this often to repair counter drift
+COUNTER_RECONCILE_INTERVAL = 3600  # seconds
+counter_reconciler = CounterReconciler(SessionLocal, interval=COUNTER_RECONCILE_INTERVAL)
 
 router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 db_dependency = Annotated[Session, Depends(get_db)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.post("/", response_model=PostResponse)
 async def create_post(
     title: str,
     content: str,
-    db: db_dependency,
+    db: async_db_dependency,
     user: user_dependency,
     image_url: Optional[str] = None
 ):
@@ -48,29 +52,97 @@ async def create_post(
         image_url=image_url
     )
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.commit()
+    feed_cache.post_created()
     return new_post
 
+def load_feed_page(db: Session, user_id: int, cursor: Optional[str], skip: int, limit: int):
+    """
+    One feed page from the database, shared part and the viewer's liked posts.
+    """
+    # Totals come from the counters on the post, so the feed costs the same no
+    # matter how many likes a post has; only "liked by me" needs the likes table
+    is_liked = exists().where(Like.post_id == Post.id, Like.user_id == user_id)
+    query = (
+        db.query(Post, User.username, is_liked)
+        .outerjoin(User, User.id == Post.user_id)
+    )
+    query = keyset_page(query, Post.created_at, Post.id, cursor, limit)
+    if not cursor and skip:
+        query = query.offset(skip)
+    rows = query.all()
+    post_ids = tuple(post.id for post, _, _ in rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0].created_at, rows[-1][0].id)
+
+    # Images are served from their own cacheable route, so the feed only carries URLs
+    posts = []
+    for post, username, _ in rows:
+        file_path = image_path(post.image_url)
+        posts.append({
+            "id": post.id,
+            "title": post.title,
+            "content": post.content,
+            "user_id": post.user_id,
+            "image_url": image_url_for(os.path.basename(file_path)) if file_path else None,
+            "created_at": post.created_at,
+            "total_likes": post.like_count,
+            "total_comments": post.comment_count,
+            "username": username,
+        })
+    page = FeedPage(posts, next_cursor, post_ids)
+    return page, {post.id: bool(liked) for post, _, liked in rows}
+
+
 @router.get("/", response_model=List[GetPostResponse])
-def get_all_posts(db: db_dependency, current_user: user_dependency, skip: int = 0, limit: int = 10):
+def get_all_posts(
+    db: db_dependency,
+    current_user: user_dependency,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+):
     """
-    Retrieve all posts with pagination.
+    Retrieve posts newest first. Pass the X-Next-Cursor header of a page as `cursor`
+    to get the next one; `skip` is kept for older clients. Responses carry an
+    ETag; send it back in If-None-Match to get a 304 when nothing changed.
     """
-    posts = db.query(Post).order_by(Post.created_at.desc()).offset(skip).limit(limit).all()
-    for post in posts:
-        post.total_likes = db.query(Like).filter(Like.post_id == post.id).count()
-        post.total_comments = db.query(Comment).filter(Comment.post_id == post.id).count()
-        post.is_liked_by_current_user = db.query(Like).filter(Like.post_id == post.id, Like.user_id == current_user.id).count() > 0
-        post.username = db.query(User).filter(User.id == post.user_id).first().username
-        if post.image_url:
-            file_path = post.image_url.lstrip('/')
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as image_file:
-                    post.image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            else:
-                post.image_data = None
-    return posts
+    key = (cursor, 0 if cursor else skip, limit)
+    page = feed_cache.page(key)
+    if page is None:
+        clock = feed_cache.clock()
+        version = feed_cache.viewer_version(current_user.id)
+        page, liked = load_feed_page(db, current_user.id, cursor, skip, limit)
+        feed_cache.put_page(key, page, clock)
+        feed_cache.put_liked(current_user.id, liked, version)
+        result = "miss"
+    else:
+        post_ids = [post["id"] for post in page.posts]
+        liked, missing = feed_cache.liked_bits(current_user.id, post_ids)
+        if missing:
+            version = feed_cache.viewer_version(current_user.id)
+            loaded = dict.fromkeys(missing, False)
+            loaded.update(dict.fromkeys(db.scalars(
+                select(Like.post_id).where(Like.user_id == current_user.id, Like.post_id.in_(missing))
+            ), True))
+            feed_cache.put_liked(current_user.id, loaded, version)
+            liked.update(loaded)
+        result = "hit"
+
+    bits = [liked[post["id"]] for post in page.posts]
+    headers = {"ETag": page_etag(page, bits), "Cache-Control": "private, no-cache"}
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        FEED_CACHE_REQUESTS.labels(result, "304").inc()
+        return Response(status_code=304, headers=headers)
+    FEED_CACHE_REQUESTS.labels(result, "200").inc()
+    response.headers.update(headers)
+    return [{**post, "is_liked_by_current_user": bit} for post, bit in zip(page.posts, bits)]
 
 @router.get("/{post_id}", response_model=PostResponse)
 def get_post(post_id: int, db: db_dependency):
@@ -96,6 +168,7 @@ def update_post(post_id: int, title: str, content: str, db: db_dependency, curre
     post.title = title
     post.content = content
     db.commit()
+    feed_cache.post_changed(post.id)
     db.refresh(post)
     return post
 
@@ -115,30 +188,32 @@ def delete_post(post_id: int, db: db_dependency, current_user: user_dependency):
 
     # Delete associated comments
     db.query(Comment).filter(Comment.post_id == post.id).delete()
+    comment_cache.invalidate(post.id)
 
     # Delete the image file if it exists
-    if post.image_url:
-        file_path = post.image_url.lstrip('/')
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # Identical uploads share one file, so keep it while another post still uses it
+    file_path = image_path(post.image_url)
+    if file_path and not db.query(Post.id).filter(Post.image_url == post.image_url, Post.id != post.id).first():
+        delete_image_files(os.path.basename(file_path))
 
     # Delete the post
     db.delete(post)
     db.commit()
+    feed_cache.post_deleted(post_id)
     return {"detail": "Post deleted successfully"}
 
 @router.post("/upload-image/")
 async def upload_image(file: UploadFile = File(...)):
     """
-    Upload an image for a specific post.
+    Upload an image for a specific post. Resized variants are generated off the
+    event loop and identical files are stored once. Files that are not images
+    or are over MAX_UPLOAD_BYTES are rejected.
     """
-    upload_dir = "image_uploads"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_location = os.path.join(upload_dir, unique_filename)
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    file_url = f"/{file_location}"
-    return {"file_url": file_url}
\ No newline at end of file
+    file_extension = os.path.splitext(file.filename or "")[1].lower()
+    if file_extension not in IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Only JPEG, PNG, GIF and WebP images can be uploaded")
+    try:
+        filename = await store_upload(file.file, file_extension)
+    except InvalidUpload as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"file_url": image_url_for(filename)}
\ No newline at end of file
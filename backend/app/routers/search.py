@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query, Response
+from typing import Annotated, List, Optional
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_rank_cursor, encode_rank_cursor
+from app.routers.auth import get_current_user
+from app.schemas.search import SearchHit
+from app.services.search_index import search
+
+MAX_QUERY_LENGTH = 200
+
+router = APIRouter(
+    dependencies=[Depends(get_current_user)]
+)
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+@router.get("/", response_model=List[SearchHit])
+def search_posts_and_comments(
+    db: db_dependency,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Posts and comments containing every word of `q`, best match first, with a
+    highlighted snippet. Pass the X-Next-Cursor header of a page as `cursor` to
+    get the next one.
+    """
+    after = decode_rank_cursor(cursor) if cursor else None
+    hits = search(db, q, after, limit)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        last = hits[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_rank_cursor(last["rank"], last["kind"], last["id"])
+    return hits
@@ -10,4 +10,9 @@ class LikeResponse(BaseModel):
     post_id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class LikeState(BaseModel):
+    post_id: int
+    total_likes: int
+    is_liked_by_current_user: bool
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 # Notification schemas
 class NotificationResponse(BaseModel):
@@ -7,6 +8,24 @@ class NotificationResponse(BaseModel):
     message: str
     user_id: int
     created_at: datetime
+    is_read: bool = False
+    action: Optional[str] = None
+    actor_id: Optional[int] = None
+    post_id: Optional[int] = None
+    comment_id: Optional[int] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class MarkReadRequest(BaseModel):
+    up_to_id: int
+
+
+class MarkReadResponse(BaseModel):
+    updated: int
+    unread: int
+
+
+class UnreadCountResponse(BaseModel):
+    count: int
\ No newline at end of file
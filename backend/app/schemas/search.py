@@ -0,0 +1,14 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Literal
+
+# Search schemas
+class SearchHit(BaseModel):
+    kind: Literal["post", "comment"]
+    # The post's or the comment's id
+    id: int
+    post_id: int
+    title: str
+    created_at: datetime
+    # Escaped HTML, matched words wrapped in <mark>
+    snippet: str
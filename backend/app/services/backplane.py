@@ -0,0 +1,130 @@
+import asyncio
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+# Called with (user_id, message, key) for every message published by another worker.
+# A user_id of None means "deliver to everyone".
+DeliverCallback = Callable[[Optional[int], str, Optional[str]], Awaitable[None]]
+
+
+class Backplane:
+    """
+    Pub/sub channel between workers. Each worker delivers to its own sockets
+    directly and publishes once so that the other workers can do the same.
+    """
+
+    async def start(self, deliver: DeliverCallback):
+        pass
+
+    async def publish(self, user_id: Optional[int], message: str, key: Optional[str] = None):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class LocalBackplane(Backplane):
+    """
+    Single-process backplane: there are no other workers to talk to.
+    """
+
+
+class SQLiteBackplane(Backplane):
+    """
+    Backplane shared through an SQLite file, so several uvicorn workers on one
+    host can exchange notifications without an external broker. Every worker
+    appends what it publishes and polls for rows written by the others.
+    """
+
+    def __init__(self, path: str = "backplane.db", poll_interval: float = 0.05, retention: float = 60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self.last_id = 0
+        # sqlite3 connections are not safe to share between threads, so all
+        # database work for this worker goes through a single thread.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backplane")
+        self.conn: Optional[sqlite3.Connection] = None
+        self.poller: Optional[asyncio.Task] = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _open(self) -> int:
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS backplane_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, user_id INTEGER, "
+            "message TEXT NOT NULL, key TEXT, created_at REAL NOT NULL)"
+        )
+        # Only deliver what is published after this worker started
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM backplane_messages").fetchone()[0]
+
+    def _insert(self, user_id: Optional[int], message: str, key: Optional[str]):
+        self.conn.execute(
+            "INSERT INTO backplane_messages (origin, user_id, message, key, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self.origin, user_id, message, key, time.time()),
+        )
+
+    def _fetch(self, last_id: int) -> List[Tuple[int, str, Optional[int], str, Optional[str]]]:
+        return self.conn.execute(
+            "SELECT id, origin, user_id, message, key FROM backplane_messages WHERE id > ? ORDER BY id",
+            (last_id,),
+        ).fetchall()
+
+    def _prune(self):
+        self.conn.execute("DELETE FROM backplane_messages WHERE created_at < ?", (time.time() - self.retention,))
+
+    async def start(self, deliver: DeliverCallback):
+        self.last_id = await self._run(self._open)
+        self.poller = asyncio.create_task(self._poll(deliver))
+
+    async def publish(self, user_id: Optional[int], message: str, key: Optional[str] = None):
+        await self._run(self._insert, user_id, message, key)
+
+    async def _poll(self, deliver: DeliverCallback):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = await self._run(self._fetch, self.last_id)
+                for row_id, origin, user_id, message, key in rows:
+                    self.last_id = row_id
+                    if origin != self.origin:
+                        await deliver(user_id, message, key)
+                if time.monotonic() - last_prune > self.retention:
+                    await self._run(self._prune)
+                    last_prune = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except sqlite3.Error:
+                # Another worker may hold the write lock; try again next tick
+                pass
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self.poller is not None:
+            self.poller.cancel()
+            try:
+                await self.poller
+            except asyncio.CancelledError:
+                pass
+        if self.conn is not None:
+            await self._run(self.conn.close)
+        self.executor.shutdown(wait=False)
+
+
+def create_backplane(name: str) -> Backplane:
+    """
+    Build a backplane from a setting such as "local" or "sqlite:///path/to/file.db".
+    """
+    if name == "local":
+        return LocalBackplane()
+    if name.startswith("sqlite:///"):
+        return SQLiteBackplane(path=name[len("sqlite:///"):])
+    raise ValueError(f"Unknown notification backplane: {name}")
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# (created_at, id) of the last comment a client has seen
+Position = Tuple[datetime, int]
+
+
+def page_of(comments: List[dict], complete: bool, after: Optional[Position], limit: int) -> Optional[List[dict]]:
+    """
+    Up to limit + 1 comments older than `after` from a newest-first window, the
+    extra one telling the caller another page follows. Returns None when the
+    window cannot answer because older comments were left out of it.
+    """
+    if after is not None:
+        comments = [comment for comment in comments if (comment["created_at"], comment["id"]) < after]
+    if len(comments) > limit:
+        return comments[:limit + 1]
+    return comments if complete else None
+
+
+class CommentCache:
+    """
+    The newest comments of recently read posts, so hot threads are listed
+    without touching the database. New comments are added to a cached window
+    as they are created rather than dropping it. Entries expire after `ttl`
+    seconds to pick up comments created by other workers.
+    """
+
+    def __init__(self, max_posts: int = 1000, window: int = 101, ttl: float = 30.0):
+        self.max_posts = max_posts
+        self.window = window
+        self.ttl = ttl
+        # post_id -> (newest-first comments, whether that is all of them, expiry)
+        self.entries: "OrderedDict[int, Tuple[List[dict], bool, float]]" = OrderedDict()
+        # Bumped on every write to a post, so a window read from the database
+        # while a comment was being added is not cached without it
+        self.versions: "OrderedDict[int, int]" = OrderedDict()
+        # get_comments runs in the threadpool, create_comment on the event loop
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def page(self, post_id: int, after: Optional[Position], limit: int) -> Optional[List[dict]]:
+        with self.lock:
+            entry = self.entries.get(post_id)
+            if entry is not None and entry[2] <= time.monotonic():
+                del self.entries[post_id]
+                entry = None
+            comments = page_of(entry[0], entry[1], after, limit) if entry is not None else None
+            if comments is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(post_id)
+            self.hits += 1
+            return comments
+
+    def version(self, post_id: int) -> int:
+        with self.lock:
+            return self.versions.get(post_id, 0)
+
+    def put(self, post_id: int, comments: List[dict], complete: bool, version: int):
+        with self.lock:
+            if self.versions.get(post_id, 0) != version:
+                return
+            self.entries[post_id] = (comments[:self.window], complete, time.monotonic() + self.ttl)
+            self.entries.move_to_end(post_id)
+            while len(self.entries) > self.max_posts:
+                self.entries.popitem(last=False)
+
+    def add(self, post_id: int, comment: dict):
+        with self.lock:
+            self._bump(post_id)
+            entry = self.entries.get(post_id)
+            if entry is None:
+                return
+            comments, complete, expires_at = entry
+            comments = [comment] + comments
+            if len(comments) > self.window:
+                comments, complete = comments[:self.window], False
+            self.entries[post_id] = (comments, complete, expires_at)
+
+    def invalidate(self, post_id: int):
+        with self.lock:
+            self._bump(post_id)
+            self.entries.pop(post_id, None)
+
+    def _bump(self, post_id: int):
+        self.versions[post_id] = self.versions.get(post_id, 0) + 1
+        self.versions.move_to_end(post_id)
+        while len(self.versions) > self.max_posts * 10:
+            self.versions.popitem(last=False)
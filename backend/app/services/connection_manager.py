@@ -0,0 +1,431 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict, List, Optional, Tuple
+from fastapi import WebSocket
+from app.metrics import (
+    ACTIVE_CONNECTIONS,
+    FRAMES_SENT,
+    MESSAGES_DROPPED,
+    MESSAGES_SENT,
+    NOTIFICATION_FANOUT,
+    NOTIFICATION_QUEUE_DEPTH,
+    NOTIFICATION_SEND_SECONDS,
+)
+from app.services.backplane import Backplane, LocalBackplane
+from app.services.replay_buffer import ReplayBuffer
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; clients fall back to JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients that cannot keep up with their queue
+SLOW_CONSUMER_CLOSE_CODE = 1013  # "Try again later"
+# Close codes for clients that stopped answering pings or send too much
+IDLE_CLOSE_CODE = 4408
+POLICY_VIOLATION_CLOSE_CODE = 1008
+PING_MESSAGE = '{"action": "ping"}'
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class WireEncoding(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+class Payload:
+    """
+    A JSON message and its MessagePack form, built once per fan-out and shared
+    by every connection it is queued on.
+    """
+
+    __slots__ = ("text", "_packed", "created")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._packed: Optional[bytes] = None
+        self.created = time.perf_counter()
+
+    @property
+    def packed(self) -> bytes:
+        if self._packed is None:
+            self._packed = msgpack.packb(json.loads(self.text))
+        return self._packed
+
+
+class Connection:
+    """
+    A single socket with a bounded outbound queue, so a slow client only ever
+    delays itself. The queue and its writer task only exist while there is
+    something to send; an idle connection is just this object.
+    """
+
+    __slots__ = (
+        "manager", "websocket", "user_id", "encoding", "batch", "queue", "writer", "paused",
+        "dropped", "closed", "last_received", "tokens", "tokens_updated",
+    )
+
+    def __init__(
+        self,
+        manager: "ConnectionManager",
+        websocket: WebSocket,
+        user_id: int,
+        encoding: WireEncoding = WireEncoding.JSON,
+        batch: bool = False,
+    ):
+        self.manager = manager
+        self.websocket = websocket
+        self.user_id = user_id
+        self.encoding = encoding
+        # Batching clients get every frame as an array of one or more messages
+        self.batch = batch
+        self.queue: Optional[Deque[Tuple[Optional[str], Payload]]] = None
+        self.writer: Optional[asyncio.Task] = None
+        # Set while connect() queues the session frame and replay ahead of live pushes
+        self.paused = False
+        self.dropped = 0
+        self.closed = False
+        # Heartbeat and inbound rate limit state
+        self.last_received = time.monotonic()
+        self.tokens = float(manager.inbound_burst)
+        self.tokens_updated = self.last_received
+
+    @property
+    def queued(self) -> int:
+        return len(self.queue) if self.queue is not None else 0
+
+    def enqueue(self, message: Payload, key: Optional[str] = None) -> bool:
+        """
+        Queue a message without blocking. Returns False if the message was not queued.
+        """
+        if self.closed:
+            return False
+        if self.queue is None:
+            self.queue = deque()
+        NOTIFICATION_QUEUE_DEPTH.observe(len(self.queue))
+        if len(self.queue) >= self.manager.max_queue_size:
+            if not self._handle_overflow(message, key):
+                return False
+        else:
+            self.queue.append((key, message))
+        self.wake()
+        return True
+
+    def wake(self):
+        if self.writer is None and self.queue and not self.closed and not self.paused:
+            self.writer = asyncio.create_task(self._drain())
+
+    def _handle_overflow(self, message: Payload, key: Optional[str]) -> bool:
+        policy = self.manager.overflow_policy
+        if policy == OverflowPolicy.DISCONNECT:
+            self._record_drop(len(self.queue) + 1)
+            self.manager.stats["slow_consumers_disconnected"] += 1
+            logger.warning("disconnecting slow consumer", extra={"user_id": self.user_id, "queued": len(self.queue)})
+            self.manager.drop_connection(self, SLOW_CONSUMER_CLOSE_CODE)
+            return False
+        if policy == OverflowPolicy.COALESCE and key is not None:
+            # Replace the pending message for the same event instead of growing the queue
+            for index, (queued_key, _) in enumerate(self.queue):
+                if queued_key == key:
+                    self.queue[index] = (key, message)
+                    self._record_drop(1)
+                    return True
+        self.queue.popleft()
+        self.queue.append((key, message))
+        self._record_drop(1)
+        return True
+
+    def _record_drop(self, count: int):
+        self.dropped += count
+        self.manager.stats["messages_dropped"] += count
+        MESSAGES_DROPPED.inc(count)
+
+    async def _drain(self):
+        try:
+            while not self.closed and self.queue:
+                if self.batch and len(self.queue) < self.manager.max_batch:
+                    # Let a burst build up for a moment so it leaves as one frame
+                    await asyncio.sleep(self.manager.batch_window)
+                    if self.closed:
+                        break
+                count = min(len(self.queue), self.manager.max_batch if self.batch else 1)
+                messages = [self.queue.popleft()[1] for _ in range(count)]
+                await self._send(messages)
+                sent = time.perf_counter()
+                for message in messages:
+                    NOTIFICATION_SEND_SECONDS.observe(sent - message.created)
+                self.manager.stats["messages_sent"] += count
+                self.manager.stats["frames_sent"] += 1
+                MESSAGES_SENT.inc(count)
+                FRAMES_SENT.inc()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # The peer is gone; stop writing and forget about it
+            logger.debug("socket write failed", extra={"user_id": self.user_id}, exc_info=True)
+            self.manager.drop_connection(self)
+        finally:
+            if self.writer is asyncio.current_task():
+                self.writer = None
+                # Give the memory back until the next message
+                if not self.queue:
+                    self.queue = None
+
+    def received(self) -> bool:
+        """
+        Note an inbound message. Returns False once the client sends faster than
+        the manager's inbound rate allows.
+        """
+        now = time.monotonic()
+        self.last_received = now
+        rate, burst = self.manager.inbound_rate, self.manager.inbound_burst
+        self.tokens = min(burst, self.tokens + (now - self.tokens_updated) * rate)
+        self.tokens_updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def _send(self, messages: List[Payload]):
+        if self.encoding == WireEncoding.MSGPACK:
+            if self.batch:
+                # An array header followed by the already packed items is a valid array
+                frame = msgpack.Packer().pack_array_header(len(messages))
+                frame += b"".join(message.packed for message in messages)
+            else:
+                frame = messages[0].packed
+            await self.websocket.send_bytes(frame)
+        elif self.batch:
+            await self.websocket.send_text("[" + ",".join(message.text for message in messages) + "]")
+        else:
+            await self.websocket.send_text(messages[0].text)
+
+    def close(self):
+        self.closed = True
+        self.queue = None
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        backplane: Optional[Backplane] = None,
+        history: Optional[ReplayBuffer] = None,
+        batch_window: float = 0.005,
+        max_batch: int = 50,
+        heartbeat_interval: float = 25.0,
+        idle_timeout: float = 60.0,
+        inbound_rate: float = 5.0,
+        inbound_burst: int = 20,
+    ):
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.backplane = backplane or LocalBackplane()
+        self.history = history
+        # How long a batching connection waits for more messages before sending
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        # Sockets that have been quiet for heartbeat_interval get a ping; sockets
+        # with nothing received for idle_timeout (no pong either) are closed
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.inbound_rate = inbound_rate
+        self.inbound_burst = inbound_burst
+        self.reaper: Optional[asyncio.Task] = None
+        # Sockets are indexed by user id so a notification only costs as many
+        # sends as its recipient has open tabs/devices.
+        self.user_connections: Dict[int, Dict[WebSocket, Connection]] = {}
+        self.stats = {
+            "messages_sent": 0,
+            "frames_sent": 0,
+            "messages_dropped": 0,
+            "slow_consumers_disconnected": 0,
+            "idle_reaped": 0,
+            "rate_limited": 0,
+        }
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(sockets) for sockets in self.user_connections.values())
+
+    async def start(self):
+        await self.backplane.start(self._deliver_remote)
+        if self.heartbeat_interval:
+            self.reaper = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+            self.reaper = None
+        await self.backplane.stop()
+        self.close_all()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.sweep()
+
+    def sweep(self):
+        """
+        Ping quiet sockets and close the ones that stopped answering. A single pass
+        over every connection per interval, with one shared ping payload.
+        """
+        now = time.monotonic()
+        ping = Payload(PING_MESSAGE)
+        for sockets in list(self.user_connections.values()):
+            for connection in list(sockets.values()):
+                idle = now - connection.last_received
+                if idle > self.idle_timeout:
+                    self.stats["idle_reaped"] += 1
+                    self.drop_connection(connection, IDLE_CLOSE_CODE)
+                elif idle >= self.heartbeat_interval:
+                    connection.enqueue(ping)
+
+    def received(self, connection: Connection) -> bool:
+        """
+        Record an inbound message; closes the socket if it exceeds the rate limit.
+        """
+        if connection.received():
+            return True
+        self.stats["rate_limited"] += 1
+        logger.warning("closing socket over inbound rate limit", extra={"user_id": connection.user_id})
+        self.drop_connection(connection, POLICY_VIOLATION_CLOSE_CODE)
+        return False
+
+    async def _deliver_remote(self, user_id: Optional[int], message: str, key: Optional[str]):
+        if user_id is None:
+            self.deliver_all(message)
+        else:
+            if self.history is not None:
+                self.history.observe(user_id, message)
+            self.deliver_to_user(message, user_id, key)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        last_seen: Optional[int] = None,
+        encoding: WireEncoding = WireEncoding.JSON,
+        batch: bool = False,
+    ) -> Connection:
+        """
+        Register a socket. The first frame tells the client the current sequence
+        number and the encoding in use; if it reconnects with `last_seen`, what it
+        missed is queued ahead of any new pushes.
+        """
+        await websocket.accept()
+        encoding = WireEncoding(encoding)
+        if encoding == WireEncoding.MSGPACK and msgpack is None:
+            encoding = WireEncoding.JSON
+        seq = await self.history.load(user_id) if self.history is not None else None
+        connection = Connection(self, websocket, user_id, encoding, batch)
+        connection.paused = True
+        self.user_connections.setdefault(user_id, {})[websocket] = connection
+        ACTIVE_CONNECTIONS.inc()
+        if seq is not None:
+            # Nothing is sent while the connection is paused, so live pushes that
+            # arrive while the gap is being read simply wait behind it
+            missed = [] if last_seen is None else await self.history.missed(user_id, last_seen, seq)
+            session = json.dumps({"action": "session", "seq": seq, "resync": missed is None, "encoding": encoding.value})
+            messages = [session] + (missed or [])
+            if connection.queue is None:
+                connection.queue = deque()
+            connection.queue.extendleft((None, Payload(message)) for message in reversed(messages))
+        connection.paused = False
+        connection.wake()
+        return connection
+
+    def disconnect(self, websocket: WebSocket, user_id: int):
+        sockets = self.user_connections.get(user_id)
+        if sockets is None:
+            return
+        connection = sockets.pop(websocket, None)
+        if connection is not None:
+            connection.close()
+            ACTIVE_CONNECTIONS.dec()
+        if not sockets:
+            del self.user_connections[user_id]
+
+    def close_all(self):
+        """
+        Stop every writer task.
+        """
+        for sockets in list(self.user_connections.values()):
+            for connection in list(sockets.values()):
+                self.disconnect(connection.websocket, connection.user_id)
+
+    def drop_connection(self, connection: Connection, code: Optional[int] = None):
+        """
+        Remove a connection the server gave up on, optionally closing the socket.
+        """
+        self.disconnect(connection.websocket, connection.user_id)
+        if code is not None:
+            asyncio.create_task(self._close_quietly(connection.websocket, code))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def deliver_to_user(self, message: str, user_id: int, key: Optional[str] = None) -> int:
+        """
+        Queue a message on every local socket of a single user. Returns the number of
+        sockets it was queued on; never waits for the network.
+        """
+        sockets = self.user_connections.get(user_id)
+        if not sockets:
+            NOTIFICATION_FANOUT.observe(0)
+            return 0
+        payload = Payload(message)
+        delivered = sum(connection.enqueue(payload, key) for connection in list(sockets.values()))
+        NOTIFICATION_FANOUT.observe(delivered)
+        return delivered
+
+    def deliver_all(self, message: str):
+        payload = Payload(message)
+        for sockets in list(self.user_connections.values()):
+            for connection in list(sockets.values()):
+                connection.enqueue(payload)
+
+    async def send_to_user(self, message: str, user_id: int, key: Optional[str] = None) -> int:
+        """
+        Deliver to the user's sockets on this worker and publish once for the others.
+        """
+        delivered = self.deliver_to_user(message, user_id, key)
+        await self.backplane.publish(user_id, message, key)
+        return delivered
+
+    async def send_personal_message(self, message: str, client_id: int):
+        await self.send_to_user(message, client_id)
+
+    async def broadcast(self, message: str):
+        self.deliver_all(message)
+        await self.backplane.publish(None, message)
+
+    def queue_metrics(self) -> dict:
+        depths = [connection.queued for sockets in self.user_connections.values() for connection in sockets.values()]
+        return {
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "max_queue_size": self.max_queue_size,
+            "overflow_policy": self.overflow_policy.value,
+            "batch_window": self.batch_window,
+            **self.stats,
+        }
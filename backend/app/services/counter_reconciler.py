@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.models.comment import Comment
+from app.models.like import Like
+from app.models.post import Post
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_post_counters(db: Session) -> int:
+    """
+    Compare every post's like_count/comment_count with the rows they count and
+    repair the ones that drifted. Returns the number of posts repaired.
+    """
+    likes = dict(db.execute(select(Like.post_id, func.count()).group_by(Like.post_id)).all())
+    comments = dict(db.execute(select(Comment.post_id, func.count()).group_by(Comment.post_id)).all())
+    drifted = [
+        post_id
+        for post_id, like_count, comment_count in db.execute(select(Post.id, Post.like_count, Post.comment_count))
+        if like_count != likes.get(post_id, 0) or comment_count != comments.get(post_id, 0)
+    ]
+    db.rollback()
+    for post_id in drifted:
+        # Recount inside the UPDATE so a like committed since the scan is not lost
+        db.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(
+                like_count=select(func.count()).where(Like.post_id == post_id).scalar_subquery(),
+                comment_count=select(func.count()).where(Comment.post_id == post_id).scalar_subquery(),
+            )
+        )
+    db.commit()
+    return len(drifted)
+
+
+class CounterReconciler:
+    """
+    Runs reconcile_post_counters in a worker thread on startup, which also fills
+    the counters of databases created before they existed, and then every
+    `interval` seconds.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float = 3600.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.repaired = 0
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            repaired = reconcile_post_counters(db)
+        finally:
+            db.close()
+        self.repaired += repaired
+        if repaired:
+            logger.warning("repaired post counters", extra={"posts": repaired})
+        return repaired
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("post counter reconciliation failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
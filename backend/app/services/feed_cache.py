@@ -0,0 +1,203 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# cursor, skip and limit of a feed request
+PageKey = Tuple[Optional[str], int, int]
+
+
+class FeedPage:
+    """
+    One feed page as every viewer sees it: the posts without the "liked by me"
+    bit, the cursor of the next page and a digest of both for the ETag.
+    """
+
+    __slots__ = ("posts", "next_cursor", "post_ids", "digest", "expires")
+
+    def __init__(self, posts: List[dict], next_cursor: Optional[str], post_ids: Tuple[int, ...], expires: float = 0.0):
+        self.posts = posts
+        self.next_cursor = next_cursor
+        # Includes the look-ahead row, which decides whether a next page exists
+        self.post_ids = post_ids
+        self.expires = expires
+        body = json.dumps([posts, next_cursor], default=str, sort_keys=True).encode()
+        self.digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def page_etag(page: FeedPage, liked: List[bool]) -> str:
+    # The body is fully determined by the shared page and the viewer's bits, so
+    # together they make a strong validator
+    mask = sum(1 << position for position, bit in enumerate(liked) if bit)
+    return f'"{page.digest}-{mask:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class FeedCache:
+    """
+    Two layers of feed data. Pages are shared by all viewers and hold posts with
+    their counters; like and comment events patch the counters in place, edits
+    and deletes drop the pages holding the post and new posts drop the pages
+    they would push down. The second layer is which posts each viewer liked,
+    updated as they like and unlike. Both expire after `ttl` seconds to pick up
+    writes made by other workers.
+    """
+
+    def __init__(self, max_pages: int = 1000, max_viewers: int = 10000, ttl: float = 5.0):
+        self.max_pages = max_pages
+        self.max_viewers = max_viewers
+        self.ttl = ttl
+        self.pages: "OrderedDict[PageKey, FeedPage]" = OrderedDict()
+        # post_id -> keys of the pages showing it
+        self.pages_by_post: Dict[int, set] = {}
+        # user_id -> ({post_id: liked}, expiry)
+        self.liked: "OrderedDict[int, Tuple[Dict[int, bool], float]]" = OrderedDict()
+        # A clock bumped on every write and the time each post last changed, so
+        # a page read from the database while one of its posts was being written
+        # is not cached without the write
+        self.generation = 0
+        self.changed: "OrderedDict[int, int]" = OrderedDict()
+        self.last_created = 0
+        self.last_deleted = 0
+        self.viewer_versions: Dict[int, int] = {}
+        # get_all_posts runs in the threadpool, like and comment events on the event loop
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clock(self) -> int:
+        with self.lock:
+            return self.generation
+
+    def page(self, key: PageKey) -> Optional[FeedPage]:
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None and page.expires <= time.monotonic():
+                self._drop(key)
+                page = None
+            if page is None:
+                self.misses += 1
+                return None
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put_page(self, key: PageKey, page: FeedPage, generation: int):
+        with self.lock:
+            if any(self.changed.get(post_id, 0) > generation for post_id in page.post_ids):
+                return
+            if key[0] is None and (self.last_created > generation or key[1] and self.last_deleted > generation):
+                return
+            if key in self.pages:
+                self._drop(key)
+            page.expires = time.monotonic() + self.ttl
+            self.pages[key] = page
+            for post_id in page.post_ids:
+                self.pages_by_post.setdefault(post_id, set()).add(key)
+            while len(self.pages) > self.max_pages:
+                self._drop(next(iter(self.pages)))
+
+    def liked_bits(self, user_id: int, post_ids: Iterable[int]) -> Tuple[Dict[int, bool], List[int]]:
+        """
+        The known bits for post_ids and the ids that still have to be loaded.
+        """
+        with self.lock:
+            entry = self.liked.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self.liked.pop(user_id, None)
+                return {}, list(post_ids)
+            self.liked.move_to_end(user_id)
+            bits = entry[0]
+            return {post_id: bits[post_id] for post_id in post_ids if post_id in bits}, [
+                post_id for post_id in post_ids if post_id not in bits
+            ]
+
+    def viewer_version(self, user_id: int) -> int:
+        with self.lock:
+            return self.viewer_versions.get(user_id, 0)
+
+    def put_liked(self, user_id: int, bits: Dict[int, bool], version: int):
+        with self.lock:
+            if self.viewer_versions.get(user_id, 0) != version:
+                return
+            entry = self.liked.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                entry = ({}, time.monotonic() + self.ttl)
+            entry[0].update(bits)
+            self.liked[user_id] = entry
+            self.liked.move_to_end(user_id)
+            while len(self.liked) > self.max_viewers:
+                evicted, _ = self.liked.popitem(last=False)
+                self.viewer_versions.pop(evicted, None)
+
+    def set_liked(self, user_id: int, post_id: int, liked: bool):
+        with self.lock:
+            self.viewer_versions[user_id] = self.viewer_versions.get(user_id, 0) + 1
+            entry = self.liked.get(user_id)
+            if entry is not None:
+                entry[0][post_id] = liked
+
+    def count_changed(self, post_id: int, likes: int = 0, comments: int = 0):
+        with self.lock:
+            self._touch(post_id)
+            for key in self.pages_by_post.get(post_id, ()):
+                # Pages are replaced rather than changed, so a request holding the
+                # old one still renders a body that matches its ETag
+                page = self.pages[key]
+                posts = [
+                    {
+                        **post,
+                        "total_likes": max(0, post["total_likes"] + likes),
+                        "total_comments": max(0, post["total_comments"] + comments),
+                    } if post["id"] == post_id else post
+                    for post in page.posts
+                ]
+                self.pages[key] = FeedPage(posts, page.next_cursor, page.post_ids, page.expires)
+
+    def post_changed(self, post_id: int):
+        with self.lock:
+            self._touch(post_id)
+            for key in list(self.pages_by_post.get(post_id, ())):
+                self._drop(key)
+
+    def post_deleted(self, post_id: int):
+        # Pages read with skip after the deleted post shift up by one
+        with self.lock:
+            self._touch(post_id)
+            self.last_deleted = self.generation
+            keys = set(self.pages_by_post.get(post_id, ()))
+            keys.update(key for key in self.pages if key[0] is None and key[1])
+            for key in keys:
+                self._drop(key)
+
+    def post_created(self):
+        # A new post is the newest one, so only pages read without a cursor move
+        with self.lock:
+            self.generation += 1
+            self.last_created = self.generation
+            for key in [key for key in self.pages if key[0] is None]:
+                self._drop(key)
+
+    def _touch(self, post_id: int):
+        self.generation += 1
+        self.changed[post_id] = self.generation
+        self.changed.move_to_end(post_id)
+        while len(self.changed) > self.max_pages * 100:
+            self.changed.popitem(last=False)
+
+    def _drop(self, key: PageKey):
+        page = self.pages.pop(key)
+        for post_id in page.post_ids:
+            keys = self.pages_by_post.get(post_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.pages_by_post[post_id]
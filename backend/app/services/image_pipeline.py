@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it only originals are stored
+    Image = None
+
+UPLOAD_DIR = "image_uploads"
+# Only these are accepted as uploads and served inline
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp"})
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Widths generated for every upload, served by the image route via ?w=
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMAT = "webp"
+VARIANT_QUALITY = 80
+PROCESS_POOL_SIZE = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class InvalidUpload(ValueError):
+    """
+    The upload is too large or is not an image Pillow can decode.
+    """
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PROCESS_POOL_SIZE)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def variant_filename(digest: str, width: int) -> str:
+    return f"{digest}_{width}.{VARIANT_FORMAT}"
+
+
+def render_variants(source_path: str, digest: str, upload_dir: str = UPLOAD_DIR) -> List[int]:
+    """
+    Write the compact resized copies of an image. Runs in a worker process, so it
+    only takes and returns plain values. Returns the widths that were written.
+    """
+    if Image is None:
+        return []
+    written = []
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+        for width in VARIANT_WIDTHS:
+            target = os.path.join(upload_dir, variant_filename(digest, width))
+            if not os.path.exists(target):
+                resized = original.copy()
+                resized.thumbnail((width, width * 10))
+                tmp = f"{target}.tmp"
+                resized.save(tmp, format=VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+                os.replace(tmp, target)
+            written.append(width)
+            # thumbnail() never upscales, so wider variants would be identical
+            if width >= original.width:
+                break
+    return written
+
+
+def _store_original(source: BinaryIO, extension: str, upload_dir: str, max_bytes: int) -> tuple:
+    # Copy in chunks, hashing on the way, so the upload is never held in memory
+    os.makedirs(upload_dir, exist_ok=True)
+    tmp = os.path.join(upload_dir, f"{uuid.uuid4().hex}.tmp")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as buffer:
+            while chunk := source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise InvalidUpload(f"Images are limited to {max_bytes // (1024 * 1024)} MB")
+                hasher.update(chunk)
+                buffer.write(chunk)
+        digest = hasher.hexdigest()[:32]
+        filename = f"{digest}{extension.lower()}"
+        path = os.path.join(upload_dir, filename)
+        # Content-addressed: an identical upload may already be on disk
+        created = not os.path.exists(path)
+        if created:
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return digest, filename, path, created
+
+
+async def store_upload(
+    source: BinaryIO, extension: str, upload_dir: str = UPLOAD_DIR, max_bytes: int = MAX_UPLOAD_BYTES
+) -> str:
+    """
+    Save an uploaded image once per distinct content and build its variants in
+    the process pool. Returns the stored file name; raises InvalidUpload for
+    files over max_bytes or that Pillow cannot decode.
+    """
+    digest, filename, path, created = await asyncio.to_thread(
+        _store_original, source, extension, upload_dir, max_bytes
+    )
+    already_rendered = os.path.exists(os.path.join(upload_dir, variant_filename(digest, VARIANT_WIDTHS[0])))
+    if Image is not None and not already_rendered:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_get_executor(), render_variants, path, digest, upload_dir)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Pillow raises these for files that are not (valid) images
+            if created and os.path.exists(path):
+                os.remove(path)
+            raise InvalidUpload("The file is not a valid image")
+    return filename
+
+
+def pick_variant(filename: str, width: Optional[int], upload_dir: str = UPLOAD_DIR) -> str:
+    """
+    Smallest stored variant at least `width` pixels wide, else the widest one,
+    falling back to the original file.
+    """
+    if not width:
+        return os.path.join(upload_dir, filename)
+    digest = os.path.splitext(filename)[0]
+    best = None
+    for candidate in VARIANT_WIDTHS:
+        path = os.path.join(upload_dir, variant_filename(digest, candidate))
+        if not os.path.exists(path):
+            break
+        best = path
+        if candidate >= width:
+            break
+    return best or os.path.join(upload_dir, filename)
+
+
+def delete_image_files(filename: str, upload_dir: str = UPLOAD_DIR):
+    digest = os.path.splitext(filename)[0]
+    names = [filename] + [variant_filename(digest, width) for width in VARIANT_WIDTHS]
+    for name in names:
+        path = os.path.join(upload_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# An actor is their user id and name
+Actor = Tuple[int, str]
+# Called once per (recipient, post, action) and window with the actors, oldest first
+EmitCallback = Callable[[int, int, str, List[Actor]], Awaitable[None]]
+
+OPPOSITE_ACTION = {"like": "unlike", "unlike": "like"}
+
+
+class LikeAggregator:
+    """
+    Coalesces like/unlike events per (recipient, post) over a short window.
+    Each window produces at most one notification per action, listing the
+    actors; an actor who likes and unlikes (or the reverse) within the same
+    window cancels out and produces nothing. Recipients liking their own post
+    are left out.
+
+    add() returns once the event is pending, before the summary is pushed or
+    stored, so a writer in flush_before_ack mode does not hold up likes.
+    """
+
+    def __init__(self, emit: EmitCallback, window: float = 2.0):
+        self.emit = emit
+        self.window = window
+        # (recipient, post) -> actor -> pending action, in arrival order
+        self.pending: Dict[Tuple[int, int], Dict[Actor, str]] = {}
+        self.timers: Dict[Tuple[int, int], asyncio.Task] = {}
+        self.events_received = 0
+        self.events_cancelled = 0
+        self.emits_failed = 0
+
+    async def add(self, recipient_id: int, post_id: int, actor: Actor, action: str):
+        self.events_received += 1
+        if actor[0] == recipient_id:
+            # Clients drop frames from themselves, which would hide the others
+            return
+        if self.window <= 0:
+            await self.emit(recipient_id, post_id, action, [actor])
+            return
+        key = (recipient_id, post_id)
+        actors = self.pending.setdefault(key, {})
+        previous = actors.get(actor)
+        if previous == OPPOSITE_ACTION[action]:
+            # like followed by unlike (or the reverse): nothing changed
+            del actors[actor]
+            self.events_cancelled += 2
+        elif previous is None:
+            actors[actor] = action
+        if key not in self.timers:
+            self.timers[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key: Tuple[int, int]):
+        await asyncio.sleep(self.window)
+        self.timers.pop(key, None)
+        await self._flush(key)
+
+    async def _flush(self, key: Tuple[int, int]):
+        actors = self.pending.pop(key, None)
+        if not actors:
+            return
+        recipient_id, post_id = key
+        for action in ("like", "unlike"):
+            acting = [actor for actor, pending_action in actors.items() if pending_action == action]
+            if not acting:
+                continue
+            try:
+                await self.emit(recipient_id, post_id, action, acting)
+            except Exception:
+                # Nothing awaits the timer tasks, so the error is logged here;
+                # the other action's summary is still sent
+                self.emits_failed += 1
+                logger.exception(
+                    "like summary failed", extra={"user_id": recipient_id, "post_id": post_id, "action": action}
+                )
+
+    async def flush_all(self):
+        """
+        Emit everything still waiting for its window, e.g. on shutdown.
+        """
+        timers, self.timers = self.timers, {}
+        for task in timers.values():
+            task.cancel()
+        for key in list(self.pending):
+            await self._flush(key)
+
+
+def summarize(actors: List[str], action: str) -> str:
+    verb = "liked" if action == "like" else "unliked"
+    if len(actors) == 1:
+        return f"{actors[0]} {verb} your post"
+    others = len(actors) - 1
+    return f"{actors[-1]} and {others} {'other' if others == 1 else 'others'} {verb} your post"
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Iterable, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.notification import Notification
+
+logger = logging.getLogger(__name__)
+
+# Fields of a notification record that are also stored as their own columns
+RECORD_COLUMNS = ("action", "actor_id", "post_id", "comment_id")
+
+
+class Durability(str, Enum):
+    # The caller waits until the batch holding its row is committed
+    FLUSH_BEFORE_ACK = "flush_before_ack"
+    # The caller returns as soon as the row is buffered
+    ASYNC = "async"
+
+
+class NotificationWriter:
+    """
+    Write-behind buffer for notification rows. Rows are collected in memory and
+    written with one bulk insert and one commit per interval or per batch_size rows,
+    instead of one commit per notification.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        durability: Durability = Durability.ASYNC,
+        on_written: Optional[Callable[[Iterable[dict]], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = Durability(durability)
+        # Called on the event loop with every batch once it is committed
+        self.on_written = on_written
+        self.buffer: List[Tuple[dict, Optional[asyncio.Future]]] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = False
+        self.rows_written = 0
+        self.flushes = 0
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+        self.task = asyncio.create_task(self._run())
+
+    async def enqueue(
+        self, user_id: int, message: str, seq: Optional[int] = None, record: Optional[dict] = None, is_read: bool = False
+    ):
+        row = {"user_id": user_id, "message": message, "created_at": datetime.utcnow(), "is_read": is_read, "seq": seq}
+        # `record` is what `message` was serialized from
+        record = record or {}
+        row.update({column: record.get(column) for column in RECORD_COLUMNS})
+        waiter = None
+        if self.durability == Durability.FLUSH_BEFORE_ACK:
+            waiter = asyncio.get_running_loop().create_future()
+        self.buffer.append((row, waiter))
+
+        if self.task is None:
+            # Not running inside the app lifecycle: write straight away
+            try:
+                await self.flush()
+            except Exception:
+                if waiter is None:
+                    raise
+        elif len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+        if waiter is not None:
+            await waiter
+
+    async def _run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Rows stay buffered and are retried on the next tick
+                logger.warning("notification flush failed", extra={"buffered": len(self.buffer)}, exc_info=True)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        try:
+            await asyncio.to_thread(self._write, [row for row, _ in batch])
+        except Exception as exc:
+            if self.durability == Durability.FLUSH_BEFORE_ACK:
+                for _, waiter in batch:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+            else:
+                self.buffer[:0] = batch
+            raise
+        if self.on_written is not None:
+            self.on_written(row for row, _ in batch)
+        for _, waiter in batch:
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    def _write(self, rows: List[dict]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(Notification), rows)
+            db.commit()
+        finally:
+            db.close()
+        self.rows_written += len(rows)
+        self.flushes += 1
+
+    async def stop(self):
+        """
+        Stop the background flusher and write whatever is still buffered.
+        """
+        if self.task is not None:
+            self.stopping = True
+            self.wakeup.set()
+            await self.task
+            self.task = None
+        await self.flush()
@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when too many hash/verify calls are already waiting.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a dedicated thread pool. bcrypt releases
+    the GIL, so the event loop keeps serving sockets while logins are checked.
+    At most `max_concurrency` calls run at once and at most `max_pending` wait.
+    """
+
+    def __init__(self, context: CryptContext, max_concurrency: int = 2, max_pending: int = 64):
+        self.context = context
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="password-hasher")
+        self.pending = 0
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_concurrency + self.max_pending:
+            raise PasswordHasherBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
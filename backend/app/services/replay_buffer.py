@@ -0,0 +1,142 @@
+import json
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from app.database import AsyncSessionLocal
+from app.models.notification import Notification, NotificationSequence
+
+
+class ReplayBuffer:
+    """
+    Per-user notification sequence numbers and a bounded ring buffer of the most
+    recent pushes, so a client that reconnects with the last sequence number it
+    saw only receives what it missed. Gaps older than the ring buffer are read
+    from the notifications table through its (user_id, seq) index.
+
+    With `shared_sequences`, for workers sharing users through a backplane,
+    numbers are handed out by a per-user counter row in SQLite instead of in
+    memory, so two workers never give different pushes the same number.
+    """
+
+    def __init__(self, size: int = 100, max_users: int = 10000, max_replay: int = 500, shared_sequences: bool = False):
+        self.size = size
+        self.max_users = max_users
+        self.max_replay = max_replay
+        self.shared_sequences = shared_sequences
+        # Last sequence number handed out per user. Never evicted, so numbers
+        # stay monotonic even while rows are still waiting in the writer.
+        self.last_seq: Dict[int, int] = {}
+        self.buffers: "OrderedDict[int, Deque[Tuple[int, str]]]" = OrderedDict()
+        self.replayed_from_memory = 0
+        self.replayed_from_db = 0
+        self.resyncs = 0
+
+    async def load(self, user_id: int) -> int:
+        """
+        Current sequence number of a user, read from the database the first time.
+        """
+        if self.shared_sequences:
+            # Other workers hand out numbers too, so always ask the counter
+            async with AsyncSessionLocal() as db:
+                stored = await db.scalar(
+                    select(NotificationSequence.last_seq).where(NotificationSequence.user_id == user_id)
+                )
+            self._advance(user_id, stored or 0)
+        elif user_id not in self.last_seq:
+            async with AsyncSessionLocal() as db:
+                stored = await db.scalar(
+                    select(func.max(Notification.seq)).where(Notification.user_id == user_id)
+                )
+            # A push may have claimed a number while we were reading
+            self.last_seq.setdefault(user_id, stored or 0)
+        return self.last_seq.get(user_id, 0)
+
+    async def next_seq(self, user_id: int) -> int:
+        if self.shared_sequences:
+            return await self._claim_shared(user_id)
+        await self.load(user_id)
+        self.last_seq[user_id] += 1
+        return self.last_seq[user_id]
+
+    async def _claim_shared(self, user_id: int) -> int:
+        # One upsert increments and reads the counter under SQLite's write lock.
+        # A new row starts after the user's stored rows, which may have been
+        # numbered in memory before workers were shared.
+        first = select(func.coalesce(func.max(Notification.seq), 0) + 1).where(
+            Notification.user_id == user_id
+        ).scalar_subquery()
+        statement = (
+            insert(NotificationSequence)
+            .values(user_id=user_id, last_seq=first)
+            .on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"last_seq": NotificationSequence.last_seq + 1},
+            )
+            .returning(NotificationSequence.last_seq)
+        )
+        async with AsyncSessionLocal() as db:
+            seq = await db.scalar(statement)
+            await db.commit()
+        self._advance(user_id, seq)
+        return seq
+
+    def _advance(self, user_id: int, seq: int):
+        if seq > self.last_seq.get(user_id, 0):
+            self.last_seq[user_id] = seq
+
+    def record(self, user_id: int, seq: int, message: str):
+        buffer = self.buffers.get(user_id)
+        if buffer is None:
+            buffer = self.buffers[user_id] = deque(maxlen=self.size)
+            if len(self.buffers) > self.max_users:
+                self.buffers.popitem(last=False)
+        else:
+            self.buffers.move_to_end(user_id)
+        buffer.append((seq, message))
+        self._advance(user_id, seq)
+
+    def observe(self, user_id: Optional[int], message: str):
+        """
+        Record a message pushed by another worker if it carries a sequence number.
+        """
+        if user_id is None:
+            return
+        try:
+            seq = json.loads(message).get("seq")
+        except (ValueError, AttributeError):
+            return
+        if isinstance(seq, int):
+            self.record(user_id, seq, message)
+
+    async def missed(self, user_id: int, last_seen: int, up_to: int) -> Optional[List[str]]:
+        """
+        Messages with last_seen < seq <= up_to, oldest first. Returns None when the
+        gap is larger than max_replay and the client should reload instead.
+        """
+        if up_to <= last_seen:
+            return []
+        if up_to - last_seen > self.max_replay:
+            self.resyncs += 1
+            return None
+        # With shared sequences, other workers' pushes are observed after a
+        # backplane poll, so the ring buffer is not in seq order and may have
+        # holes. Key by seq to sort and drop repeats, and read the holes.
+        buffered = {seq: message for seq, message in self.buffers.get(user_id, ()) if last_seen < seq <= up_to}
+        missing = [seq for seq in range(last_seen + 1, up_to + 1) if seq not in buffered]
+        stored = {}
+        if missing:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Notification.seq, Notification.message).where(
+                        Notification.user_id == user_id,
+                        Notification.seq > last_seen,
+                        Notification.seq <= up_to,
+                        Notification.seq.in_(missing),
+                    )
+                )
+                stored = dict(result.all())
+            self.replayed_from_db += len(stored)
+        self.replayed_from_memory += len(buffered)
+        messages = {**stored, **buffered}
+        return [messages[seq] for seq in sorted(messages)]
@@ -0,0 +1,175 @@
+"""
+Full-text search over post titles, post content and comments.
+
+Posts and comments each have an FTS5 table that indexes the rows of their base
+table without storing a second copy of the text (external content). Triggers
+on the base tables keep them in step, so every write that goes through
+create_post, update_post, delete_post or create_comment updates the index in
+the same transaction. The triggers are created by the migration runner.
+
+Rebuild the index from the base tables, e.g. after restoring a backup or
+loading rows with the triggers off, from the backend folder:
+    python -m app.services.search_index
+"""
+import html
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# (table, indexed columns) of each FTS5 table's base table
+INDEXED = {
+    "posts": ("title", "content"),
+    "comments": ("content",),
+}
+# Folds case and accents so "Ha Noi" finds "Hà Nội"
+TOKENIZER = "unicode61 remove_diacritics 2"
+# A title match weighs more than a match in the body
+TITLE_WEIGHT = 5.0
+SNIPPET_TOKENS = 12
+# Markers FTS5 puts around matched terms. Control characters cannot come from
+# the escaped text, so they are swapped for <mark> after escaping.
+_OPEN, _CLOSE = "\x02", "\x03"
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+# Scoring every match of a word found in most rows takes seconds on a large
+# corpus, so only the newest matches of each table are ranked. Queries with
+# fewer matches than this are ranked in full.
+MAX_CANDIDATES = 10_000
+
+# Ranking only needs rowids and scores; snippets are made for the page alone
+RANK_SQL = """
+SELECT kind, id, rank FROM (
+    SELECT * FROM (
+        SELECT 'post' AS kind, rowid AS id, bm25(posts_fts, :title_weight, 1.0) AS rank
+        FROM posts_fts WHERE posts_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'comment', rowid, bm25(comments_fts)
+        FROM comments_fts WHERE comments_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+    )
+)
+WHERE :after_rank IS NULL OR (rank, kind, id) > (:after_rank, :after_kind, :after_id)
+ORDER BY rank, kind, id
+LIMIT :limit
+"""
+DETAILS_SQL = {
+    "post": f"""
+        SELECT posts.id, posts.id AS post_id, posts.title, posts.created_at,
+               snippet(posts_fts, -1, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid
+        WHERE posts_fts MATCH :query AND posts_fts.rowid IN ({{ids}})
+    """,
+    "comment": f"""
+        SELECT comments.id, comments.post_id, posts.title, comments.created_at,
+               snippet(comments_fts, 0, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM comments_fts
+        JOIN comments ON comments.id = comments_fts.rowid
+        JOIN posts ON posts.id = comments.post_id
+        WHERE comments_fts MATCH :query AND comments_fts.rowid IN ({{ids}})
+    """,
+}
+
+
+def create_search_index(conn: Connection):
+    """
+    Create the FTS5 tables and the triggers that maintain them.
+    """
+    for table, columns in INDEXED.items():
+        names = ", ".join(columns)
+        new = ", ".join(f"NEW.{column}" for column in columns)
+        old = ", ".join(f"OLD.{column}" for column in columns)
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+            f"{names}, content='{table}', content_rowid='id', tokenize='{TOKENIZER}')"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {table}_fts(rowid, {names}) VALUES (NEW.id, {new}); END"
+        ))
+        # External content tables drop a row by being given its old text
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', OLD.id, {old}); END"
+        ))
+        # Only text edits; the counter triggers update posts on every like
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {names} ON {table} BEGIN "
+            f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', OLD.id, {old}); "
+            f"INSERT INTO {table}_fts(rowid, {names}) VALUES (NEW.id, {new}); END"
+        ))
+
+
+def rebuild_search_index(conn: Connection):
+    """
+    Re-index every post and comment from the base tables.
+    """
+    for table in INDEXED:
+        conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+        conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('optimize')"))
+
+
+def match_query(query: str) -> Optional[str]:
+    """
+    FTS5 query matching rows that contain every word of `query`, the last one
+    as a prefix so results follow typing. None if there is nothing to search.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    # Quoted, so words like AND, OR and NEAR are searched for, not parsed
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search(db: Session, query: str, after: Optional[Tuple[float, str, int]], limit: int) -> List[dict]:
+    """
+    Best matches first, starting after the (rank, kind, id) of the previous
+    page's last hit. One extra hit is fetched to know whether a next page exists.
+    """
+    match = match_query(query)
+    if match is None:
+        return []
+    after_rank, after_kind, after_id = after or (None, None, None)
+    page = db.execute(text(RANK_SQL), {
+        "query": match,
+        "title_weight": TITLE_WEIGHT,
+        "candidates": MAX_CANDIDATES,
+        "after_rank": after_rank,
+        "after_kind": after_kind,
+        "after_id": after_id,
+        "limit": limit + 1,
+    }).all()
+    details = {}
+    for kind, sql in DETAILS_SQL.items():
+        ids = [row.id for row in page if row.kind == kind]
+        if ids:
+            # ids are integers read back from SQLite
+            rows = db.execute(text(sql.format(ids=", ".join(str(int(row_id)) for row_id in ids))), {"query": match})
+            details.update({(kind, row.id): row for row in rows})
+    # A row deleted between the two statements is left out
+    return [
+        {**details[row.kind, row.id]._asdict(), "kind": row.kind, "rank": row.rank,
+         "snippet": highlight(details[row.kind, row.id].snippet)}
+        for row in page if (row.kind, row.id) in details
+    ]
+
+
+if __name__ == "__main__":
+    import time
+    from app.database import engine
+    from app.migrations import migrate
+
+    migrate(engine)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_search_index(conn)
+        counts = {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in INDEXED}
+    print(f"indexed {counts} in {time.perf_counter() - start:.1f}s")
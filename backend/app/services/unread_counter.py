@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Iterable, Tuple
+from sqlalchemy import func, select
+from app.database import AsyncSessionLocal
+from app.models.notification import Notification
+
+
+class UnreadCounter:
+    """
+    Per-user unread notification counts kept in memory. A user's count is loaded
+    once with an index-only COUNT and then adjusted as rows are written or marked
+    read, so badge polling does not touch the notifications table. Entries are
+    reloaded after `ttl` seconds to pick up changes made by other workers, and
+    only the `max_users` most recently read are kept.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        # user_id -> (unread count, expiry), least recently read first
+        self.counts: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+        # Bumped on every change to a user's count, so a COUNT that ran while a
+        # batch was committed or marked read is not stored and then adjusted again
+        self.versions: "OrderedDict[int, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: int) -> int:
+        entry = self.counts.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            self.counts.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        version = self.versions.get(user_id, 0)
+        async with AsyncSessionLocal() as db:
+            count = await db.scalar(
+                select(func.count())
+                .select_from(Notification)
+                .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+            )
+        if self.versions.get(user_id, 0) == version:
+            self.counts[user_id] = (count, time.monotonic() + self.ttl)
+            self.counts.move_to_end(user_id)
+            while len(self.counts) > self.max_users:
+                self.counts.popitem(last=False)
+        return count
+
+    def add(self, user_id: int, delta: int):
+        self._bump(user_id)
+        # Users whose count was never loaded pick up the change when it is
+        entry = self.counts.get(user_id)
+        if entry is not None:
+            self.counts[user_id] = (max(0, entry[0] + delta), entry[1])
+
+    def record_written(self, rows: Iterable[dict]):
+        for row in rows:
+            if not row.get("is_read"):
+                self.add(row["user_id"], 1)
+
+    def _bump(self, user_id: int):
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+        self.versions.move_to_end(user_id)
+        while len(self.versions) > self.max_users * 10:
+            self.versions.popitem(last=False)
@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class UserCache:
+    """
+    Bounded LRU cache of verified access token -> user snapshot. Entries expire
+    after `ttl` seconds or when the token itself expires, whichever is first.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # ORM events can fire from threadpool handlers
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Any]:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: Any, token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self.lock:
+            self.entries[token] = (user, expires_at)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self.lock:
+            stale = [token for token, (user, _) in self.entries.items() if user.id == user_id]
+            for token in stale:
+                del self.entries[token]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
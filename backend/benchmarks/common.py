@@ -0,0 +1,115 @@
+"""
+Helpers shared by the benchmarks: fake sockets for ConnectionManager, a
+throwaway working folder with seeded users and posts, and latency percentiles.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Iterable, List
+
+SESSION_FRAME_PREFIX = '{"action": "session"'
+
+
+class FakeWebSocket:
+    """
+    Accepts everything ConnectionManager sends and counts the frames, leaving
+    out the session frame sent on connect. Subclasses look at each frame in
+    received().
+    """
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, message: str):
+        if message.startswith(SESSION_FRAME_PREFIX):
+            return
+        self.frames += 1
+        self.received(message)
+
+    async def send_bytes(self, message: bytes):
+        self.frames += 1
+
+    def received(self, message: str):
+        pass
+
+
+class TimedWebSocket(FakeWebSocket):
+    """
+    Records delivery latency of messages whose text is the time.perf_counter()
+    they were due at. A `delay` makes every send that much slower.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.latencies: List[float] = []
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        await super().send_text(message)
+
+    def received(self, message: str):
+        self.latencies.append(time.perf_counter() - float(message))
+
+
+def use_scratch_dir():
+    """
+    Run from a new temporary folder, so the app's note.db is a throwaway
+    database. Call before importing the app.
+    """
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+
+
+def quiet_sql():
+    from app import database
+
+    database.engine.echo = False
+    database.async_engine.echo = False
+
+
+def seed_users(count: int, hashed_password: str = "x", posts: int = 0):
+    """
+    Users user0..user{count - 1} with ids 1..count, and `posts` posts by user0.
+    """
+    from app import database
+    from app.models.post import Post
+    from app.models.user import User
+
+    quiet_sql()
+    with database.SessionLocal() as db:
+        db.add_all([
+            User(username=f"user{i}", email=f"user{i}@example.com", hashed_password=hashed_password)
+            for i in range(count)
+        ])
+        db.flush()
+        db.add_all([Post(title=f"Post {i}", content="content", user_id=1) for i in range(posts)])
+        db.commit()
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def latency_summary(latencies: Iterable[float], width: int = 0) -> str:
+    """
+    p50, p99 and max of latencies in seconds, as milliseconds.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return "no samples"
+    return (
+        f"p50={statistics.median(ordered) * 1000:{width}.2f}ms "
+        f"p99={percentile(ordered, 0.99) * 1000:{width}.2f}ms "
+        f"max={ordered[-1] * 1000:{width}.2f}ms"
+    )
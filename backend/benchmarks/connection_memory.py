@@ -0,0 +1,66 @@
+"""
+Memory per registered connection and the cost of connect/disconnect.
+
+Registers a large number of fake sockets with ConnectionManager and reports
+the bytes the registry and per-connection state take, measured with
+tracemalloc, after connecting, after a broadcast has been written and drained,
+and how long connecting and disconnecting every socket took. The fake sockets
+are created before measuring, so only the manager's own state is counted.
+
+Run from the backend folder, optionally with the number of connections:
+    python -m benchmarks.connection_memory [100000]
+"""
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.services.connection_manager import ConnectionManager
+from benchmarks.common import FakeWebSocket
+
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+SOCKETS_PER_USER = 2
+
+
+def traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def main():
+    manager = ConnectionManager()
+    sockets = [FakeWebSocket() for _ in range(CONNECTIONS)]
+    tracemalloc.start()
+    baseline = traced()
+
+    start = time.perf_counter()
+    for index, websocket in enumerate(sockets):
+        await manager.connect(websocket, index // SOCKETS_PER_USER)
+    connect_time = time.perf_counter() - start
+    idle = traced() - baseline
+
+    manager.deliver_all('{"action": "ping"}')
+    _, peak = tracemalloc.get_traced_memory()
+    while manager.stats["messages_sent"] < CONNECTIONS:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0)
+    drained = traced() - baseline
+
+    start = time.perf_counter()
+    for index, websocket in enumerate(sockets):
+        manager.disconnect(websocket, index // SOCKETS_PER_USER)
+    disconnect_time = time.perf_counter() - start
+    left = traced() - baseline
+    tracemalloc.stop()
+
+    print(f"{CONNECTIONS} connections, {SOCKETS_PER_USER} per user")
+    print(f"  idle:            {idle / CONNECTIONS:8.0f} bytes/connection ({idle / 1e6:.1f} MB)")
+    print(f"  during fan-out:  {(peak - baseline) / CONNECTIONS:8.0f} bytes/connection")
+    print(f"  after draining:  {drained / CONNECTIONS:8.0f} bytes/connection")
+    print(f"  after disconnect:{left / CONNECTIONS:8.0f} bytes/connection")
+    print(f"  connect {connect_time / CONNECTIONS * 1e6:.2f} us, disconnect {disconnect_time / CONNECTIONS * 1e6:.2f} us per socket")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
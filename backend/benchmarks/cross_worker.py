@@ -0,0 +1,99 @@
+"""
+Cross-worker delivery through the SQLite backplane.
+
+Starts two worker processes sharing one backplane file. Each holds a socket for
+its own user and sends notifications to the user connected to the other
+worker. Reports how many messages crossed over and the publish-to-receive
+latency, and exits with an error unless each user received every message
+exactly once.
+
+Run from the backend folder:
+    python -m benchmarks.cross_worker
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+
+from app.services.backplane import SQLiteBackplane
+from app.services.connection_manager import ConnectionManager
+from benchmarks.common import FakeWebSocket, latency_summary
+
+MESSAGES = 200
+
+
+class PeerWebSocket(FakeWebSocket):
+    # Messages are "index:time.time()": wall-clock time, as sender and receiver
+    # are separate processes
+    def __init__(self):
+        super().__init__()
+        self.latencies = []
+        self.payloads = []
+
+    def received(self, message: str):
+        index, sent_at = message.split(":")
+        self.payloads.append(int(index))
+        self.latencies.append(time.time() - float(sent_at))
+
+
+async def worker(path: str, own_user: int, peer_user: int, ready, go, results):
+    manager = ConnectionManager(backplane=SQLiteBackplane(path=path, poll_interval=0.01))
+    await manager.start()
+    websocket = PeerWebSocket()
+    await manager.connect(websocket, own_user)
+    ready.set()
+    while not go.is_set():
+        await asyncio.sleep(0.01)
+
+    for index in range(MESSAGES):
+        await manager.send_to_user(f"{index}:{time.time()}", peer_user)
+        await asyncio.sleep(0.001)
+    deadline = time.monotonic() + 5
+    while len(websocket.latencies) < MESSAGES and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+    await manager.stop()
+    results.put((own_user, websocket.payloads, websocket.latencies))
+
+
+def run_worker(*args):
+    asyncio.run(worker(*args))
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "backplane.db")
+    ready = [multiprocessing.Event(), multiprocessing.Event()]
+    go = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(path, 1, 2, ready[0], go, results)),
+        multiprocessing.Process(target=run_worker, args=(path, 2, 1, ready[1], go, results)),
+    ]
+    for process in processes:
+        process.start()
+    for event in ready:
+        event.wait()
+    go.set()
+    problems = []
+    for _ in processes:
+        try:
+            user_id, payloads, latencies = results.get(timeout=30)
+        except queue.Empty:
+            problems.append("a worker did not report")
+            break
+        distinct = len(set(payloads))
+        line = f"user {user_id}: received {distinct}/{MESSAGES}, duplicates {len(payloads) - distinct}"
+        print(f"{line} {latency_summary(latencies)}")
+        if len(payloads) != MESSAGES or distinct != MESSAGES:
+            problems.append(f"user {user_id} received {len(payloads)} messages, {distinct} distinct, of {MESSAGES}")
+    for process in processes:
+        process.join(timeout=10)
+    if problems:
+        sys.exit("\n".join(problems))
+
+
+if __name__ == "__main__":
+    main()
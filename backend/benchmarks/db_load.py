@@ -0,0 +1,87 @@
+"""
+Request throughput and WebSocket delivery latency under database load.
+
+Seeds a throwaway database, then drives concurrent like/unlike requests through
+the real FastAPI app while a fake socket receives a timestamped notification
+every 10 ms. If handlers block the event loop on database calls, the socket's
+delivery latency grows with the request load.
+
+Run from the backend folder, optionally with the number of concurrent clients:
+    python -m benchmarks.db_load [32]
+"""
+import asyncio
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.common import TimedWebSocket, latency_summary, seed_users, use_scratch_dir
+
+use_scratch_dir()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routers.auth import create_access_token  # noqa: E402
+from app.routers.notifications import manager, notification_writer  # noqa: E402
+
+USERS = 50
+POSTS = 20
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+DURATION = 5.0
+
+
+def seed():
+    seed_users(USERS, posts=POSTS)
+    return [create_access_token(f"user{i}", i + 1, f"user{i}@example.com", timedelta(hours=1)) for i in range(USERS)]
+
+
+async def main():
+    tokens = seed()
+    await notification_writer.start()
+    websocket = TimedWebSocket()
+    await manager.connect(websocket, 10_000)
+    stop = time.perf_counter() + DURATION
+    completed = 0
+    failed = 0
+
+    async def ticker():
+        # Stamp each message with the time it was due, so a stalled event loop
+        # counts against latency instead of just delaying the next send
+        due = time.perf_counter()
+        while due < stop:
+            await manager.send_to_user(str(due), 10_000)
+            due += 0.01
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    async def client(worker: int, http: httpx.AsyncClient):
+        nonlocal completed, failed
+        headers = {"Authorization": f"Bearer {tokens[worker % USERS]}"}
+        post_id = worker % POSTS + 1
+        while time.perf_counter() < stop:
+            for request in (
+                http.post("/likes/", json={"post_id": post_id}, headers=headers),
+                http.delete(f"/likes/{post_id}", headers=headers),
+            ):
+                # Errors such as "database is locked" surface as app exceptions
+                try:
+                    response = await request
+                    failed += response.status_code >= 500
+                except Exception:
+                    failed += 1
+                completed += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(ticker(), *(client(worker, http) for worker in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+    manager.close_all()
+    await notification_writer.stop()
+
+    print(f"requests: {completed} in {elapsed:.1f}s ({completed / elapsed:.0f} req/s, {CONCURRENCY} concurrent), "
+          f"{failed} failed")
+    print(f"socket delivery latency: {latency_summary(websocket.latencies)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
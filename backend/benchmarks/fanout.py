@@ -0,0 +1,45 @@
+"""
+Fan-out benchmark for ConnectionManager.
+
+Registers a growing number of fake sockets and measures how long it takes to
+deliver one notification to a single recipient with a fixed number of tabs.
+Send cost should depend on the recipient's sockets, not on the total number
+of connected clients.
+
+Run from the backend folder:
+    python -m benchmarks.fanout
+"""
+import asyncio
+import time
+
+from app.services.connection_manager import ConnectionManager
+from benchmarks.common import FakeWebSocket
+
+
+async def run(total_connections: int, recipient_sockets: int, rounds: int = 1000):
+    manager = ConnectionManager()
+    recipient_id = 0
+    for _ in range(recipient_sockets):
+        await manager.connect(FakeWebSocket(), recipient_id)
+    for user_id in range(1, total_connections - recipient_sockets + 1):
+        await manager.connect(FakeWebSocket(), user_id)
+
+    sends = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        sends += await manager.send_to_user('{"action": "like"}', recipient_id)
+    elapsed = time.perf_counter() - start
+    manager.close_all()
+    return elapsed / rounds * 1e6, sends // rounds
+
+
+async def main():
+    print(f"{'connections':>12} {'recipient sockets':>18} {'sends/notify':>13} {'us/notify':>10}")
+    for total in (100, 1_000, 10_000, 100_000):
+        for recipient_sockets in (1, 4):
+            per_notify, sends = await run(total, recipient_sockets)
+            print(f"{total:>12} {recipient_sockets:>18} {sends:>13} {per_notify:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Feed latency when the posts on the page carry very many likes.
+
+Seeds a throwaway SQLite database where every post on the first feed page has
+100k likes (plus a long tail of ordinary posts), then times loading a feed page
+from the database. With the totals read from the counters on each post the time
+should not depend on how many likes the page has; counting them per request
+grows with it.
+
+Run from the backend folder:
+    python -m benchmarks.feed_counters
+    python -m benchmarks.feed_counters --likes 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.comment import Comment
+from app.models.like import Like
+from app.models.notification import Notification  # noqa: F401  (registers the table)
+from app.models.post import Post
+from app.models.user import User
+from app.routers.posts import load_feed_page
+from app.services.counter_reconciler import reconcile_post_counters
+
+
+def seed(engine, hot_posts: int, likes: int, other_posts: int):
+    now = datetime.utcnow()
+    total_posts = hot_posts + other_posts
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, likes + 1)
+        ])
+        # The newest posts are the hot ones, so they make up the first page
+        conn.execute(insert(Post), [
+            {"title": f"Post {i}", "content": "content", "user_id": 1, "created_at": now - timedelta(minutes=total_posts - i)}
+            for i in range(1, total_posts + 1)
+        ])
+        for post_id in range(other_posts + 1, total_posts + 1):
+            conn.execute(insert(Like), [{"user_id": user_id, "post_id": post_id} for user_id in range(1, likes + 1)])
+        conn.execute(insert(Comment), [
+            {"content": "comment", "user_id": 1, "post_id": post_id}
+            for post_id in range(1, total_posts + 1) for _ in range(5)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--likes", type=int, default=100_000, help="likes on each hot post")
+    parser.add_argument("--hot-posts", type=int, default=10)
+    parser.add_argument("--other-posts", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    started = time.perf_counter()
+    seed(engine, args.hot_posts, args.likes, args.other_posts)
+    with Session() as db:
+        repaired = reconcile_post_counters(db)
+    print(f"seeded {args.hot_posts} posts x {args.likes} likes in {time.perf_counter() - started:.1f}s, "
+          f"filled counters of {repaired} posts")
+
+    with Session() as db:
+        viewer = db.get(User, 1)
+        print(f"{'page size':>10} {'ms/page':>8} {'likes on page':>14}")
+        for limit in (args.hot_posts, 50):
+            load_feed_page(db, viewer.id, None, 0, limit)
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                page = load_feed_page(db, viewer.id, None, 0, limit)
+            elapsed = (time.perf_counter() - start) / args.rounds * 1000
+            print(f"{limit:>10} {elapsed:>8.2f} {sum(post['total_likes'] for post in page[0].posts):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Statement count and latency of GET /posts for different page sizes.
+
+Seeds a throwaway SQLite database, loads feed pages the way a cache miss does
+and counts the SQL statements issued. The count must not depend on the page
+size; the script exits with an error if it does, so it can be used as a
+regression check.
+
+Run from the backend folder:
+    python -m benchmarks.feed_queries
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.comment import Comment
+from app.models.like import Like
+from app.models.notification import Notification  # noqa: F401  (registers the table)
+from app.models.post import Post
+from app.models.user import User
+from app.routers.posts import load_feed_page
+from app.services.counter_reconciler import reconcile_post_counters
+
+
+def seed(db, users: int = 200, posts: int = 1000, likes: int = 20000, comments: int = 10000):
+    db.add_all([User(username=f"user{i}", email=f"user{i}@example.com", hashed_password="x") for i in range(users)])
+    db.flush()
+    db.add_all([Post(title=f"Post {i}", content="content", user_id=random.randint(1, users)) for i in range(posts)])
+    db.flush()
+    pairs = {(random.randint(1, users), random.randint(1, posts)) for _ in range(likes)}
+    db.add_all([Like(user_id=user_id, post_id=post_id) for user_id, post_id in pairs])
+    db.add_all([
+        Comment(content="comment", user_id=random.randint(1, users), post_id=random.randint(1, posts))
+        for _ in range(comments)
+    ])
+    db.commit()
+    # Rows were inserted directly, so fill the like and comment counters
+    reconcile_post_counters(db)
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    with Session() as db:
+        seed(db)
+        viewer = db.get(User, 1)
+        counts = set()
+        print(f"{'page size':>10} {'statements':>11} {'ms/page':>8}")
+        for limit in (10, 50, 200):
+            statements.clear()
+            start = time.perf_counter()
+            rounds = 20
+            for _ in range(rounds):
+                load_feed_page(db, viewer.id, None, 0, limit)
+            elapsed = (time.perf_counter() - start) / rounds * 1000
+            per_call = len(statements) // rounds
+            counts.add(per_call)
+            print(f"{limit:>10} {per_call:>11} {elapsed:>8.2f}")
+
+    if len(counts) != 1:
+        sys.exit("statement count depends on page size")
+
+
+if __name__ == "__main__":
+    main()
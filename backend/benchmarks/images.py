@@ -0,0 +1,60 @@
+"""
+Image upload throughput and bytes served per feed page.
+
+Generates distinct photos-like PNGs, stores them through the upload pipeline
+(process-pool variant generation, content-hash dedupe) with several uploads in
+flight, then compares the bytes a 10-post feed page costs when clients fetch
+originals versus the 640px variant.
+
+Run from the backend folder (requires Pillow):
+    python -m benchmarks.images
+"""
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from app.services import image_pipeline
+
+UPLOADS = 24
+CONCURRENCY = 4
+PAGE_SIZE = 10
+
+
+def make_image(seed: int) -> bytes:
+    image = Image.effect_noise((1600, 1200), 40 + seed % 20).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def main():
+    upload_dir = tempfile.mkdtemp()
+    payloads = [make_image(seed) for seed in range(UPLOADS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def upload(data: bytes) -> str:
+        async with semaphore:
+            return await image_pipeline.store_upload(io.BytesIO(data), ".png", upload_dir=upload_dir)
+
+    start = time.perf_counter()
+    filenames = await asyncio.gather(*(upload(data) for data in payloads))
+    elapsed = time.perf_counter() - start
+    print(f"uploads: {UPLOADS} in {elapsed:.2f}s ({UPLOADS / elapsed:.1f}/s, {CONCURRENCY} in flight)")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(data) for data in payloads[:PAGE_SIZE]))
+    print(f"duplicate uploads: {PAGE_SIZE} in {time.perf_counter() - start:.2f}s, files on disk: {len(os.listdir(upload_dir))}")
+
+    page = filenames[:PAGE_SIZE]
+    original = sum(os.path.getsize(os.path.join(upload_dir, name)) for name in page)
+    variant = sum(os.path.getsize(image_pipeline.pick_variant(name, 640, upload_dir=upload_dir)) for name in page)
+    print(f"feed page bytes: originals={original / 1e6:.1f}MB w=640 variants={variant / 1e6:.2f}MB")
+    image_pipeline.shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
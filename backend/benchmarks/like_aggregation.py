@@ -0,0 +1,87 @@
+"""
+Stored rows and pushed frames for a burst of likes on one post.
+
+Sends 1000 likes from distinct users plus 200 users toggling like/unlike five
+times each to one post author, within one aggregation window, through
+notify_like/notify_unlike. Counts the frames the author's socket receives and
+the notification rows written, with and without aggregation, and exits with an
+error if either differs from what the window should produce, so it can be used
+as a regression check.
+
+Run from the backend folder:
+    python -m benchmarks.like_aggregation
+"""
+import asyncio
+import sys
+
+from benchmarks.common import FakeWebSocket, quiet_sql, use_scratch_dir
+
+use_scratch_dir()
+
+from app import database  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models.comment import Comment  # noqa: E402,F401  (registers the table)
+from app.models.like import Like  # noqa: E402,F401  (registers the table)
+from app.models.notification import Notification  # noqa: E402
+from app.models.post import Post  # noqa: E402,F401  (registers the table)
+from app.models.user import User  # noqa: E402,F401  (registers the table)
+from app.routers import notifications  # noqa: E402
+
+AUTHOR_ID = 1
+POST_ID = 1
+FANS = 1000
+FLAPPERS = 200
+TOGGLES = 5
+EVENTS = FANS + FLAPPERS * TOGGLES * 2
+
+
+async def run(window: float) -> tuple:
+    with database.SessionLocal() as db:
+        db.query(Notification).delete()
+        db.commit()
+    notifications.like_aggregator.window = window
+    await notifications.notification_writer.start()
+    # Room for every event, so the frame count is not the queue's overflow policy
+    notifications.manager.max_queue_size = EVENTS
+    websocket = FakeWebSocket()
+    connection = await notifications.manager.connect(websocket, AUTHOR_ID)
+
+    # Actor ids start at 2 so none of them is the author
+    for user in range(FANS):
+        await notifications.notify_like(2 + user, f"fan{user}", AUTHOR_ID, POST_ID)
+    for user in range(FLAPPERS):
+        for _ in range(TOGGLES):
+            await notifications.notify_like(2 + FANS + user, f"flapper{user}", AUTHOR_ID, POST_ID)
+            await notifications.notify_unlike(2 + FANS + user, f"flapper{user}", AUTHOR_ID, POST_ID)
+
+    await notifications.like_aggregator.flush_all()
+    for _ in range(500):
+        if not connection.queue:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    await notifications.notification_writer.stop()
+    notifications.manager.close_all()
+    with database.SessionLocal() as db:
+        rows = db.query(Notification).count()
+    label = f"window={window}s" if window else "no aggregation"
+    print(f"{label:>16}: events={EVENTS} frames={websocket.frames} rows={rows}")
+    return websocket.frames, rows
+
+
+async def main():
+    quiet_sql()
+    Base.metadata.create_all(bind=database.engine)
+    problems = []
+    # Without aggregation every event is a frame and a row. With it the fans
+    # are one summary and the flappers cancel out.
+    for window, expected in ((0, EVENTS), (2.0, 1)):
+        frames, rows = await run(window)
+        if (frames, rows) != (expected, expected):
+            problems.append(f"window={window}s: expected {expected} frames and rows, got {frames} and {rows}")
+    if problems:
+        sys.exit("\n".join(problems))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+"""
+End-to-end load test for the HTTP and WebSocket paths.
+
+Seeds a throwaway SQLite database with users, posts, likes and comments,
+starts the real app under uvicorn in a subprocess, connects simulated
+WebSocket clients to /ws/{client_id}/{token} and drives a mixed feed, comment
+list, like/unlike and comment workload over HTTP. "poll" requests re-read the
+feed with the ETag of the user's last copy, like a polling client. Reports
+request throughput, p50/p95/p99 latency per request type, notify-to-receive
+latency measured from comment notifications, whose content carries the time
+they were sent, and the feed cache counters from /metrics. Results can be
+saved as JSON and compared between commits.
+
+Run from the backend folder:
+    python -m benchmarks.load --clients 50 --concurrency 16 --duration 20 --json after.json
+    python -m benchmarks.load --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+import websockets
+
+BACKEND_DIR = os.getcwd()
+COMMENT_PREFIX = "bench:"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--likes", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50, help="simulated WebSocket clients")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP workers")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic")
+    parser.add_argument("--mix", default="feed=30,poll=30,comments=10,like=15,comment=15",
+                        help="relative weights of the request types")
+    parser.add_argument("--batch", action="store_true", help="connect sockets with batch=true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+    args.clients = min(args.clients, args.users)
+    return args
+
+
+def seed(workdir: str, args) -> List[str]:
+    """
+    Build note.db in workdir and return an access token per user.
+    """
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert
+
+    from app import database
+    from app.models.comment import Comment
+    from app.models.like import Like
+    from app.models.notification import Notification  # noqa: F401
+    from app.models.post import Post
+    from app.models.user import User
+    from app.routers.auth import create_access_token
+
+    database.engine.echo = False
+    database.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    # Posts belong to users with a socket open, so comments and likes notify someone
+    owners = range(1, args.clients + 1)
+    with database.engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, args.users + 1)
+        ])
+        conn.execute(insert(Post), [
+            {"title": f"Post {i}", "content": "content " * 20, "user_id": rng.choice(owners),
+             "created_at": now - timedelta(minutes=args.posts - i)}
+            for i in range(1, args.posts + 1)
+        ])
+        pairs = set()
+        while len(pairs) < min(args.likes, args.users * args.posts):
+            pairs.add((rng.randint(1, args.users), rng.randint(1, args.posts)))
+        conn.execute(insert(Like), [{"user_id": user, "post_id": post} for user, post in pairs])
+        conn.execute(insert(Comment), [
+            {"content": f"comment {i}", "user_id": rng.randint(1, args.users), "post_id": rng.randint(1, args.posts),
+             "created_at": now - timedelta(seconds=args.comments - i)}
+            for i in range(args.comments)
+        ])
+    database.engine.dispose()
+    return [
+        create_access_token(f"user{i}", i, f"user{i}@example.com", timedelta(hours=1))
+        for i in range(1, args.users + 1)
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(workdir: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    async with httpx.AsyncClient() as http:
+        for _ in range(300):
+            if server.poll() is not None:
+                break
+            try:
+                await http.get(f"http://127.0.0.1:{port}/")
+                return server
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+    return {"count": len(ordered), "p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": at(1.0)}
+
+
+class SocketClient:
+    def __init__(self, url: str):
+        self.url = url
+        self.frames = 0
+        self.messages = 0
+        self.latencies: List[float] = []
+
+    async def run(self, connected: List["SocketClient"]):
+        async with websockets.connect(self.url) as websocket:
+            connected.append(self)
+            async for frame in websocket:
+                self.frames += 1
+                data = json.loads(frame)
+                for message in data if isinstance(data, list) else [data]:
+                    if message.get("action") == "ping":
+                        await websocket.send('{"action": "pong"}')
+                        continue
+                    self.messages += 1
+                    content = message.get("content") or ""
+                    if message.get("action") == "comment" and content.startswith(COMMENT_PREFIX):
+                        self.latencies.append(time.perf_counter() - float(content[len(COMMENT_PREFIX):]))
+
+
+async def drive(args, port: int, tokens: List[str]) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    mix = {name: float(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    latencies: Dict[str, List[float]] = {name: [] for name in mix}
+    errors: Dict[str, int] = {name: 0 for name in mix}
+    # user -> ETag of the last feed page they were sent
+    etags: Dict[int, str] = {}
+
+    clients = [
+        SocketClient(f"ws://127.0.0.1:{port}/ws/{user}/{tokens[user - 1]}" + ("?batch=true" if args.batch else ""))
+        for user in range(1, args.clients + 1)
+    ]
+    connected: List[SocketClient] = []
+    socket_tasks = [asyncio.create_task(client.run(connected)) for client in clients]
+    while len(connected) < len(clients):
+        await asyncio.sleep(0.05)
+        failed = [task for task in socket_tasks if task.done()]
+        if failed:
+            failed[0].result()
+
+    async def worker(number: int, http: httpx.AsyncClient):
+        rng = random.Random(args.seed * 1000 + number)
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < stop:
+            name = rng.choices(names, weights)[0]
+            user = rng.randint(1, args.users)
+            headers = {"Authorization": f"Bearer {tokens[user - 1]}"}
+            post_id = rng.randint(1, args.posts)
+            start = time.perf_counter()
+            if name in ("feed", "poll"):
+                if name == "poll" and user in etags:
+                    headers["If-None-Match"] = etags[user]
+                responses = [await http.get("/posts/", params={"limit": 10}, headers=headers)]
+                if "etag" in responses[0].headers:
+                    etags[user] = responses[0].headers["etag"]
+            elif name == "comments":
+                responses = [await http.get(f"/comments/{post_id}", headers=headers)]
+            elif name == "like":
+                responses = [
+                    await http.post("/likes/", json={"post_id": post_id}, headers=headers),
+                    await http.delete(f"/likes/{post_id}", headers=headers),
+                ]
+            else:
+                content = f"{COMMENT_PREFIX}{time.perf_counter()}"
+                responses = [await http.post("/comments/", json={"post_id": post_id, "content": content}, headers=headers)]
+            latencies[name].append(time.perf_counter() - start)
+            # A like on a post the user already liked is an expected 400
+            if any(response.status_code >= 500 for response in responses):
+                errors[name] += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as http:
+        started = time.perf_counter()
+        stop = started + args.duration
+        await asyncio.gather(*(worker(number, http) for number in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        metrics = (await http.get("/metrics")).text
+    # Give notifications still in flight (and like aggregation windows) time to arrive
+    await asyncio.sleep(3)
+    for task in socket_tasks:
+        task.cancel()
+    await asyncio.gather(*socket_tasks, return_exceptions=True)
+
+    requests = sum(len(samples) for samples in latencies.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "requests": {
+            name: {**percentiles(samples), "errors": errors[name], "rps": round(len(samples) / elapsed, 1)}
+            for name, samples in latencies.items()
+        },
+        "notify_to_receive": percentiles([sample for client in clients for sample in client.latencies]),
+        "feed_cache": feed_cache_stats(metrics),
+        "sockets": {
+            "clients": len(clients),
+            "frames": sum(client.frames for client in clients),
+            "messages": sum(client.messages for client in clients),
+        },
+    }
+
+
+def feed_cache_stats(metrics: str) -> dict:
+    """
+    Feed cache counters from the Prometheus text format, empty if the server has none.
+    """
+    counts: Dict[str, float] = {}
+    for line in metrics.splitlines():
+        if line.startswith("feed_cache_requests_total{"):
+            labels, value = line.rsplit(" ", 1)
+            result = labels.split('result="')[1].split('"')[0]
+            status = labels.split('status="')[1].split('"')[0]
+            counts[f"{result}_{status}"] = counts.get(f"{result}_{status}", 0) + float(value)
+    if not counts:
+        return {}
+    total = sum(counts.values())
+    hits = sum(value for key, value in counts.items() if key.startswith("hit"))
+    not_modified = sum(value for key, value in counts.items() if key.endswith("304"))
+    return {
+        "requests": int(total),
+        "hit_rate": round(hits / total, 3),
+        "not_modified_rate": round(not_modified / total, 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def report(results: dict):
+    print(f"commit {results['commit']}: {results['throughput_rps']} req/s over {results['elapsed_s']}s")
+    print(f"{'':>18} {'count':>7} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    rows = {**results["requests"], "notify->receive": results["notify_to_receive"]}
+    for name, stats in rows.items():
+        if not stats["count"]:
+            continue
+        print(
+            f"{name:>18} {stats['count']:>7} {stats.get('rps', ''):>7} {stats['p50_ms']:>8} "
+            f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats.get('errors', ''):>7}"
+        )
+    sockets = results["sockets"]
+    print(f"sockets: {sockets['clients']} clients, {sockets['frames']} frames, {sockets['messages']} messages")
+    cache = results.get("feed_cache")
+    if cache:
+        print(f"feed cache: {cache['requests']} requests, hit rate {cache['hit_rate']:.1%}, "
+              f"304 rate {cache['not_modified_rate']:.1%}")
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    print(f"{'metric':>32} {before['commit']:>10} {after['commit']:>10} {'change':>8}")
+
+    def row(label: str, old, new):
+        if old is None or new is None:
+            return
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        print(f"{label:>32} {old:>10} {new:>10} {change:>8}")
+
+    row("throughput_rps", before["throughput_rps"], after["throughput_rps"])
+    for name in after["requests"]:
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            row(f"{name} {metric}", before["requests"].get(name, {}).get(metric), after["requests"][name].get(metric))
+    for metric in ("p50_ms", "p95_ms", "p99_ms"):
+        row(f"notify->receive {metric}", before["notify_to_receive"].get(metric), after["notify_to_receive"].get(metric))
+    for metric in ("hit_rate", "not_modified_rate"):
+        row(f"feed cache {metric}", before.get("feed_cache", {}).get(metric), after.get("feed_cache", {}).get(metric))
+
+
+async def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    output = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp()
+    started = time.perf_counter()
+    tokens = seed(workdir, args)
+    print(f"seeded {args.users} users, {args.posts} posts, {args.likes} likes, {args.comments} comments "
+          f"in {time.perf_counter() - started:.1f}s")
+    port = free_port()
+    server = await start_server(workdir, port)
+    try:
+        results = await drive(args, port, tokens)
+    finally:
+        server.terminate()
+        server.wait()
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+    results = {"commit": git_commit(), "config": config, **results}
+    report(results)
+    if output:
+        with open(output, "w") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+WebSocket delivery latency during a login storm.
+
+Seeds users that share one real bcrypt hash, then fires concurrent logins at
+POST /auth/token through the real app while a fake socket receives a
+timestamped notification every 10 ms. Password checks that run on the event
+loop show up directly as socket latency.
+
+Run from the backend folder:
+    python -m benchmarks.login_storm
+"""
+import asyncio
+import time
+
+from benchmarks.common import TimedWebSocket, latency_summary, seed_users, use_scratch_dir
+
+use_scratch_dir()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routers.auth import bycrypt_context  # noqa: E402
+from app.routers.notifications import manager  # noqa: E402
+
+USERS = 40
+LOGINS = 80
+
+
+def report(label: str, latencies: list):
+    print(f"{label:>12}: {latency_summary(latencies, width=7)}")
+
+
+async def main():
+    seed_users(USERS, hashed_password=bycrypt_context.hash("secret"))
+    websocket = TimedWebSocket()
+    await manager.connect(websocket, 10_000)
+    running = True
+
+    async def ticker():
+        # Stamp each message with the time it was due, so a stalled event loop
+        # counts against latency instead of just delaying the next send
+        due = time.perf_counter()
+        while running:
+            await manager.send_to_user(str(due), 10_000)
+            due += 0.01
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(1)
+    report("idle", websocket.latencies)
+    websocket.latencies.clear()
+
+    statuses = []
+
+    async def login(http: httpx.AsyncClient, index: int):
+        response = await http.post(
+            "/auth/token", data={"username": f"user{index % USERS}", "password": "secret"}
+        )
+        statuses.append(response.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(login(http, index) for index in range(LOGINS)))
+        elapsed = time.perf_counter() - start
+    running = False
+    await ticker_task
+    manager.close_all()
+
+    report("login storm", websocket.latencies)
+    print(f"logins: {LOGINS} in {elapsed:.2f}s, statuses: { {code: statuses.count(code) for code in set(statuses)} }")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
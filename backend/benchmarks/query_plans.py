@@ -0,0 +1,189 @@
+"""
+EXPLAIN QUERY PLAN for every statement the hot endpoints run.
+
+Builds a throwaway database through the migration runner, seeds it, then calls
+each hot endpoint through the real app while recording the SQL it issues, and
+prints SQLite's plan for every distinct statement. A statement that scans a
+whole table or sorts with a temporary B-tree is flagged, as is a range-bounded
+path whose bound is not part of any index search, and the script exits with an
+error, so it can be used as a regression check for index coverage.
+
+Run from the backend folder:
+    python -m benchmarks.query_plans
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+BACKEND_DIR = os.getcwd()
+PLANNED = ("SELECT", "INSERT", "UPDATE", "DELETE")
+# Paths whose results are ordered by relevance, which no index can hold, so
+# sorting the matches is expected
+RANKED = {"search", "search next page"}
+# Paths bounded by a range on an indexed column, with the text the bound takes
+# in the plan when the index search applies it rather than a later filter
+BOUNDED = {"likes since id": "id>?", "since id": "id>?", "since id next page": "id>?"}
+
+
+def flagged(detail: str, ranked: bool = False) -> bool:
+    # "SCAN posts USING COVERING INDEX ..." walks an index in order and stops at
+    # the LIMIT; a bare "SCAN posts" reads every row. "SCAN posts_fts VIRTUAL
+    # TABLE INDEX 0:M..." is a lookup in the full-text index, and ranked paths
+    # scan the (subquery-N) of candidates it returned.
+    if detail.startswith("SCAN ") and " USING " not in detail and " VIRTUAL TABLE " not in detail:
+        return not (ranked and detail.startswith("SCAN (subquery-"))
+    return "TEMP B-TREE" in detail and not (ranked and "ORDER BY" in detail)
+
+
+def seed(engine, users: int = 50, posts: int = 200):
+    from sqlalchemy import insert
+
+    from app.models.comment import Comment
+    from app.models.like import Like
+    from app.models.notification import Notification
+    from app.models.post import Post
+    from app.models.user import User
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(2, users + 1)
+        ])
+        conn.execute(insert(Post), [
+            {"title": f"Post {i}", "content": "content", "user_id": i % users + 1,
+             "created_at": now - timedelta(minutes=posts - i)}
+            for i in range(1, posts + 1)
+        ])
+        conn.execute(insert(Like), [
+            {"user_id": user_id, "post_id": post_id}
+            for post_id in range(1, posts + 1) for user_id in range(2, users + 1, 7)
+        ])
+        conn.execute(insert(Comment), [
+            {"content": f"comment {i}", "user_id": i % users + 1, "post_id": posts, "created_at": now - timedelta(seconds=i)}
+            for i in range(100)
+        ])
+        conn.execute(insert(Notification), [
+            {"message": f'{{"action": "{action}", "seq": {seq}}}', "user_id": 1, "seq": seq,
+             "action": action, "actor_id": seq % users + 1, "post_id": seq % 20 + 1,
+             "created_at": now - timedelta(seconds=200 - seq)}
+            for seq in range(1, 200) for action in ("comment" if seq % 3 else "like",)
+        ])
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.database import async_engine, engine
+    from app.main import app
+    from app.routers.notifications import replay_buffer
+
+    statements: List[Tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(PLANNED):
+            statements.append((statement, parameters))
+
+    client = TestClient(app)
+    client.__enter__()
+    client.post("/auth/", json={"username": "user1", "email": "user1@example.com", "password": "secret"})
+    seed(engine)
+    token = client.post("/auth/token", data={"username": "user1", "password": "secret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # A second viewer reads feed pages the first one put in the cache
+    other = client.post("/auth/", json={"username": "viewer", "email": "viewer@example.com", "password": "secret"})
+    other = client.post("/auth/token", data={"username": "viewer", "password": "secret"}).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {other}"}
+    for sync_engine in (engine, async_engine.sync_engine):
+        event.listen(sync_engine, "before_cursor_execute", record)
+
+    def feed_next_page():
+        cursor = client.get("/posts/", params={"limit": 10}, headers=headers).headers["x-next-cursor"]
+        client.get("/posts/", params={"limit": 10, "cursor": cursor}, headers=headers)
+
+    def comments_next_page():
+        cursor = client.get("/comments/200", params={"limit": 20}, headers=headers).headers["x-next-cursor"]
+        client.get("/comments/200", params={"limit": 20, "cursor": cursor}, headers=headers)
+
+    def notifications_next_page():
+        cursor = client.get("/notifications/", params={"limit": 20}, headers=headers).headers["x-next-cursor"]
+        client.get("/notifications/", params={"limit": 20, "cursor": cursor}, headers=headers)
+
+    def since_id_next_page():
+        params = {"since_id": 150, "limit": 20}
+        cursor = client.get("/notifications/", params=params, headers=headers).headers["x-next-cursor"]
+        client.get("/notifications/", params={**params, "cursor": cursor}, headers=headers)
+
+    def search_next_page():
+        cursor = client.get("/search/", params={"q": "comment", "limit": 10}, headers=headers).headers["x-next-cursor"]
+        client.get("/search/", params={"q": "comment", "limit": 10, "cursor": cursor}, headers=headers)
+
+    def reconnect():
+        # An empty replay buffer sends the reconnect to the notifications table
+        replay_buffer.buffers.clear()
+        with client.websocket_connect(f"/ws/1/{token}?last_seen=150") as websocket:
+            websocket.receive_text()
+
+    hot_paths: List[Tuple[str, Callable[[], object]]] = [
+        ("login", lambda: client.post("/auth/token", data={"username": "user1", "password": "secret"})),
+        ("feed", lambda: client.get("/posts/", params={"limit": 10}, headers=headers)),
+        ("feed next page", feed_next_page),
+        ("feed liked bits", lambda: client.get("/posts/", params={"limit": 10}, headers=other_headers)),
+        ("comments", lambda: client.get("/comments/199", params={"limit": 20}, headers=headers)),
+        ("comments next page", comments_next_page),
+        ("notifications", lambda: client.get("/notifications/", params={"limit": 20}, headers=headers)),
+        ("notifications next page", notifications_next_page),
+        ("unread notifications", lambda: client.get("/notifications/", params={"unread_only": True}, headers=headers)),
+        ("comments on a post", lambda: client.get(
+            "/notifications/", params={"action": "comment", "post_id": 5}, headers=headers)),
+        ("likes since id", lambda: client.get(
+            "/notifications/", params={"action": "like", "since_id": 150}, headers=headers)),
+        ("since id", lambda: client.get("/notifications/", params={"since_id": 150, "limit": 20}, headers=headers)),
+        ("since id next page", since_id_next_page),
+        ("unread count", lambda: client.get("/notifications/notifications/count", headers=headers)),
+        ("mark read", lambda: client.post("/notifications/mark-read", json={"up_to_id": 100}, headers=headers)),
+        ("like", lambda: client.post("/likes/", json={"post_id": 3}, headers=headers)),
+        ("unlike", lambda: client.delete("/likes/3", headers=headers)),
+        ("comment", lambda: client.post("/comments/", json={"post_id": 3, "content": "hi"}, headers=headers)),
+        ("reconnect with last_seen", reconnect),
+        ("search", lambda: client.get("/search/", params={"q": "post 1"}, headers=headers)),
+        ("search next page", search_next_page),
+    ]
+
+    problems = []
+    bounds_seen = set()
+    plans = sqlite3.connect(os.path.join(workdir, "note.db"))
+    for name, call in hot_paths:
+        statements.clear()
+        call()
+        print(f"== {name}")
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            print("  " + " ".join(statement.split()))
+            for _, _, _, detail in plans.execute("EXPLAIN QUERY PLAN " + statement, parameters):
+                bad = flagged(detail, name in RANKED)
+                mark = "!!" if bad else "  "
+                print(f"  {mark} {detail}")
+                if bad:
+                    problems.append(f"{name}: {detail}")
+                if name in BOUNDED and detail.startswith("SEARCH ") and BOUNDED[name] in detail:
+                    bounds_seen.add(name)
+    client.__exit__(None, None, None)
+
+    problems += [f"{name}: no index search on {BOUNDED[name]}" for name in BOUNDED if name not in bounds_seen]
+    if problems:
+        sys.exit("statements without index coverage:\n" + "\n".join(problems))
+
+
+if __name__ == "__main__":
+    main()
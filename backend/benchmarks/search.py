@@ -0,0 +1,137 @@
+"""
+Search latency on a large corpus of posts and comments.
+
+Builds a throwaway database through the migration runner, so the full-text
+index is filled by its triggers as the rows go in, then times GET /search's
+query for words of different frequency, several words, a prefix and a second
+page. A LIKE scan over the same rows is timed once per word for comparison.
+
+Run from the backend folder:
+    python -m benchmarks.search
+    python -m benchmarks.search --posts 20000 --comments 80000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.migrations import migrate
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.user import User
+from app.services.search_index import rebuild_search_index, search
+
+CHUNK = 20_000
+
+
+def vocabulary(size: int):
+    rng = random.Random(1)
+    words = ["".join(rng.choice("abcdefghiklmnoprstuy") for _ in range(rng.randint(3, 9))) for _ in range(size)]
+    # Word frequencies in text roughly follow Zipf's law
+    weights = [1 / rank for rank in range(1, size + 1)]
+    return words, list(itertools.accumulate(weights))
+
+
+def seed(engine, posts: int, comments: int, words: list, cum_weights: list):
+    rng = random.Random(2)
+    now = datetime.utcnow()
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=length))
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"} for i in range(1, 1001)
+        ])
+    for start in range(0, posts, CHUNK):
+        with engine.begin() as conn:
+            conn.execute(insert(Post), [
+                {"title": sentence(6), "content": sentence(40), "user_id": i % 1000 + 1,
+                 "created_at": now - timedelta(seconds=posts - i)}
+                for i in range(start, min(start + CHUNK, posts))
+            ])
+    for start in range(0, comments, CHUNK):
+        with engine.begin() as conn:
+            conn.execute(insert(Comment), [
+                {"content": sentence(15), "user_id": i % 1000 + 1, "post_id": i % posts + 1}
+                for i in range(start, min(start + CHUNK, comments))
+            ])
+
+
+def timed(call, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = call()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return result, statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=200_000)
+    parser.add_argument("--comments", type=int, default=800_000)
+    parser.add_argument("--words", type=int, default=20_000, help="vocabulary size")
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    Session = sessionmaker(bind=engine)
+    words, weights = vocabulary(args.words)
+
+    started = time.perf_counter()
+    seed(engine, args.posts, args.comments, words, weights)
+    rows = args.posts + args.comments
+    elapsed = time.perf_counter() - started
+    print(f"inserted {rows} rows with incremental indexing in {elapsed:.1f}s ({elapsed / rows * 1e6:.0f} us/row)")
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_search_index(conn)
+    print(f"rebuilt the index in {time.perf_counter() - started:.1f}s, database {os.path.getsize(path) / 2**20:.0f} MiB")
+
+    queries = [
+        ("common word", words[0]),
+        ("mid word", words[200]),
+        ("rare word", words[-1]),
+        ("two words", f"{words[5]} {words[50]}"),
+        ("prefix", words[300][:3]),
+    ]
+    print(f"{'query':>12} {'matches':>9} {'p50 ms':>8} {'p95 ms':>8} {'LIKE ms':>9}")
+    with Session() as db:
+        for name, query in queries:
+            with engine.connect() as conn:
+                matches = sum(
+                    conn.execute(text(f"SELECT COUNT(*) FROM {table}_fts WHERE {table}_fts MATCH :q"),
+                                 {"q": f'"{query}"' + ("*" if name == "prefix" else "")}).scalar()
+                    for table in ("posts", "comments")
+                )
+            hits, p50, p95 = timed(lambda: search(db, query, None, args.limit), args.rounds)
+            term = query.split()[0]
+            start = time.perf_counter()
+            db.execute(
+                text("SELECT (SELECT COUNT(*) FROM posts WHERE title LIKE :p OR content LIKE :p)"
+                     " + (SELECT COUNT(*) FROM comments WHERE content LIKE :p)"),
+                {"p": f"%{term}%"},
+            ).scalar()
+            like_ms = (time.perf_counter() - start) * 1000
+            print(f"{name:>12} {matches:>9} {p50:>8.2f} {p95:>8.2f} {like_ms:>9.0f}")
+            if name == "common word" and len(hits) > args.limit:
+                last = hits[args.limit - 1]
+                after = (last["rank"], last["kind"], last["id"])
+                _, p50, p95 = timed(lambda: search(db, query, after, args.limit), args.rounds)
+                print(f"{'  next page':>12} {'':>9} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
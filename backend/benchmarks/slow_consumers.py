@@ -0,0 +1,49 @@
+"""
+Delivery latency with a few stalled clients.
+
+Connects many fast fake sockets plus a handful whose send_text sleeps, pushes a
+burst of notifications to everyone and reports p50/p99 delivery latency seen by
+the fast clients together with queue depth and drop counters.
+
+Run from the backend folder:
+    python -m benchmarks.slow_consumers
+"""
+import asyncio
+import time
+
+from app.services.connection_manager import ConnectionManager, OverflowPolicy
+from benchmarks.common import TimedWebSocket, percentile
+
+
+async def run(policy: OverflowPolicy, fast: int = 500, slow: int = 10, messages: int = 200):
+    manager = ConnectionManager(max_queue_size=50, overflow_policy=policy)
+    fast_sockets = [TimedWebSocket() for _ in range(fast)]
+    for user_id, websocket in enumerate(fast_sockets):
+        await manager.connect(websocket, user_id)
+    for user_id in range(fast, fast + slow):
+        await manager.connect(TimedWebSocket(delay=0.5), user_id)
+
+    for _ in range(messages):
+        await manager.broadcast(str(time.perf_counter()))
+        await asyncio.sleep(0.001)
+    metrics = manager.queue_metrics()
+    await asyncio.sleep(0.1)
+    manager.close_all()
+
+    latencies = sorted(latency for websocket in fast_sockets for latency in websocket.latencies)
+    p50 = percentile(latencies, 0.50) * 1000
+    p99 = percentile(latencies, 0.99) * 1000
+    print(
+        f"{policy.value:>12} p50={p50:6.2f}ms p99={p99:6.2f}ms "
+        f"queue_depth_max={metrics['queue_depth_max']} dropped={metrics['messages_dropped']} "
+        f"disconnected={metrics['slow_consumers_disconnected']}"
+    )
+
+
+async def main():
+    for policy in OverflowPolicy:
+        await run(policy)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
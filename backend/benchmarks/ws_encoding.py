@@ -0,0 +1,115 @@
+"""
+Frames and bytes on the wire per WebSocket option.
+
+Connects fake sockets whose frames really go through a local socketpair (one
+send syscall per frame), pushes bursts of comment notifications through
+ConnectionManager and reports frames/sec and bytes/sec for JSON and MessagePack,
+with and without batching and with and without permessage-deflate. Deflate is
+modelled the way the extension does it: one raw deflate stream per connection
+with context takeover, flushed per frame.
+
+Run from the backend folder:
+    python -m benchmarks.ws_encoding
+"""
+import asyncio
+import json
+import socket
+import time
+import zlib
+
+from app.services.connection_manager import ConnectionManager, WireEncoding
+from benchmarks.common import FakeWebSocket
+
+USERS = 200
+TABS = 2
+BURSTS = 20
+BURST_SIZE = 10
+
+
+class WireWebSocket(FakeWebSocket):
+    def __init__(self, deflate: bool):
+        super().__init__()
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.peer.setblocking(False)
+        self.compressor = zlib.compressobj(wbits=-15) if deflate else None
+        self.bytes = 0
+
+    async def send_text(self, message: str):
+        await self._send(message.encode())
+
+    async def send_bytes(self, message: bytes):
+        await self._send(message)
+
+    async def _send(self, payload: bytes):
+        if self.compressor is not None:
+            payload = (self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+        # Server frames are unmasked: 2 byte header, 4 more past 125 bytes
+        frame = (b"\x81\x00" if len(payload) < 126 else b"\x81\x7e\x00\x00") + payload
+        self.sock.send(frame)
+        self.peer.recv(len(frame))
+        self.frames += 1
+        self.bytes += len(frame)
+
+    def shutdown(self):
+        self.sock.close()
+        self.peer.close()
+
+
+def notification(user_id: int, seq: int) -> str:
+    return json.dumps({
+        "action": "comment",
+        "content": f"Looks great, see you at the meetup on Friday! #{seq}",
+        "user_id": user_id,
+        "from": "someone",
+        "post_id": 1234,
+        "created_at": "2026-01-01 12:00:00",
+        "seq": seq,
+    })
+
+
+async def run(encoding: WireEncoding, batch: bool, deflate: bool):
+    manager = ConnectionManager(max_queue_size=BURST_SIZE * BURSTS)
+    sockets = []
+    for user_id in range(USERS):
+        for _ in range(TABS):
+            websocket = WireWebSocket(deflate)
+            sockets.append(websocket)
+            await manager.connect(websocket, user_id, encoding=encoding, batch=batch)
+
+    start = time.perf_counter()
+    seq = 0
+    for _ in range(BURSTS):
+        for _ in range(BURST_SIZE):
+            seq += 1
+            for user_id in range(USERS):
+                manager.deliver_to_user(notification(user_id, seq), user_id)
+        await asyncio.sleep(0)
+    while manager.stats["messages_sent"] < USERS * TABS * BURSTS * BURST_SIZE:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    manager.close_all()
+    frames = sum(websocket.frames for websocket in sockets)
+    sent = sum(websocket.bytes for websocket in sockets)
+    for websocket in sockets:
+        websocket.shutdown()
+    return frames, sent, elapsed
+
+
+async def main():
+    messages = USERS * TABS * BURSTS * BURST_SIZE
+    print(f"{messages} messages to {USERS * TABS} sockets in bursts of {BURST_SIZE}")
+    print(f"{'encoding':>9} {'batch':>6} {'deflate':>8} {'frames':>8} {'bytes/msg':>10} {'frames/s':>10} {'MB/s':>7} {'msgs/s':>9}")
+    for encoding in WireEncoding:
+        for batch in (False, True):
+            for deflate in (False, True):
+                frames, sent, elapsed = await run(encoding, batch, deflate)
+                print(
+                    f"{encoding.value:>9} {str(batch):>6} {str(deflate):>8} {frames:>8} {sent / messages:>10.1f} "
+                    f"{frames / elapsed:>10.0f} {sent / elapsed / 1e6:>7.2f} {messages / elapsed:>9.0f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
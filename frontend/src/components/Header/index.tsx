@@ -39,6 +39,8 @@ const AppHeader = (props: {
   notifications: Notification[];
   setNotifications: Dispatch<SetStateAction<Notification[]>>;
   handleNotification: () => Promise<void>;
+  hasMoreNotifications: boolean;
+  loadMoreNotifications: () => Promise<void>;
   openNotification: boolean;
   setOpenNotification: Dispatch<SetStateAction<boolean>>;
 }) => {
@@ -49,6 +51,8 @@ const AppHeader = (props: {
     setUnreadMessages,
     unreadMessages,
     handleNotification,
+    hasMoreNotifications,
+    loadMoreNotifications,
     openNotification,
     setOpenNotification,
   } = props;
@@ -298,6 +302,13 @@ const AppHeader = (props: {
       >
         <List
           dataSource={notifications}
+          loadMore={
+            hasMoreNotifications && (
+              <div style={{ textAlign: "center" }}>
+                <Button onClick={loadMoreNotifications}>Load more</Button>
+              </div>
+            )
+          }
           renderItem={(notification) => {
             let data;
             try {
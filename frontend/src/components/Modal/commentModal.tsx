@@ -13,6 +13,8 @@ interface CommentModalProps {
   visible: boolean;
   onClose: () => void;
   comments: Comment[];
+  hasMore: boolean;
+  onLoadMore: () => void;
   onAddComment: (comment: string) => void;
 }
 
@@ -20,6 +22,8 @@ const CommentModal: React.FC<CommentModalProps> = ({
   visible,
   onClose,
   comments,
+  hasMore,
+  onLoadMore,
   onAddComment,
 }) => {
   const [newComment, setNewComment] = useState("");
@@ -47,6 +51,13 @@ const CommentModal: React.FC<CommentModalProps> = ({
     >
       <List
         dataSource={comments}
+        loadMore={
+          hasMore && (
+            <div style={{ textAlign: "center" }}>
+              <Button onClick={onLoadMore}>Load more</Button>
+            </div>
+          )
+        }
         renderItem={(comment) => (
           <List.Item key={comment.id}>
             <strong>{capitalizeFirstLetter(comment.username)}</strong>: {comment.content}
@@ -1,7 +1,8 @@
-import React, { useCallback, useEffect, useState } from "react";
+import React, { useCallback, useEffect, useRef, useState } from "react";
 import AppHeader from "../components/Header";
 import api from "../services/api";
 import {
+  Button,
   List,
   Skeleton,
   Grid,
@@ -27,7 +28,7 @@ import {
   timeAgo,
 } from "../ultils/ultils";
 import { useNavigate } from "react-router-dom";
-import axios from "axios";
+import axios, { AxiosResponse } from "axios";
 import EditPostModal from "../components/Modal/editPostModal";
 import CommentModal from "../components/Modal/commentModal";
 import { Comment } from "../components/Modal/commentModal";
@@ -59,12 +60,18 @@ export type Notification = {
   created_at: string;
 };
 
+// Lists come a page at a time; the cursor of the next page is in this header,
+// absent on the last page
+const nextCursor = (response: AxiosResponse): string | null =>
+  response.headers["x-next-cursor"] ?? null;
+
 const Home = () => {
   const user_id = localStorage.getItem("user_id");
   const username = localStorage.getItem("username");
   const tokenAuthen = localStorage.getItem("token");
   const navigate = useNavigate();
   const [posts, setPosts] = useState<Post[]>([]);
+  const [postsCursor, setPostsCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const { token } = useToken();
   const [isModalVisible, setIsModalVisible] = useState(false);
@@ -73,8 +80,12 @@ const Home = () => {
   const [isCommentModalVisible, setIsCommentModalVisible] = useState(false);
   const [postIdSelected, setPostIdSelected] = useState<number>();
   const [comments, setComments] = useState<Comment[]>([]);
+  const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
   const [unreadMessages, setUnreadMessages] = useState(0);
   const [notifications, setNotifications] = useState<Notification[]>([]);
+  const [notificationsCursor, setNotificationsCursor] = useState<
+    string | null
+  >(null);
   const [apiNotify, contextHolder] = notification.useNotification();
   const [openNotificationModal, setOpenNotificationModal] = useState(false);
 
@@ -90,8 +101,14 @@ const Home = () => {
     });
   };
 
-  const WS_URL = `${process.env.REACT_APP_WEBSOCKET_URL}/${user_id}/${tokenAuthen}`;
-  const { lastMessage } = useWebSocket(WS_URL, {
+  // Last notification sequence number seen, sent on reconnect so the server
+  // replays only what was missed while the socket was down
+  const lastSeq = useRef<number | null>(null);
+  const getSocketUrl = useCallback(() => {
+    const url = `${process.env.REACT_APP_WEBSOCKET_URL}/${user_id}/${tokenAuthen}?batch=true`;
+    return lastSeq.current === null ? url : `${url}&last_seen=${lastSeq.current}`;
+  }, [user_id, tokenAuthen]);
+  const { lastMessage, sendMessage } = useWebSocket(getSocketUrl, {
     share: false,
     shouldReconnect: () => true,
   });
@@ -99,92 +116,114 @@ const Home = () => {
   // Run when a new WebSocket message is received (lastMessage)
   useEffect(() => {
     if (lastMessage !== null) {
-      const data = JSON.parse(lastMessage.data);
-      // Notification for the current user
-      if (data.from === username) {
-        return;
-      }
-      if (data.user_id === Number(user_id)) {
-        if (data.action !== "unlike") {
-          setUnreadMessages((prev) => prev + 1);
-          setNotifications((prev) => [
-            {
-              id: Date.now(),
-              user_id: data.user_id,
-              message: lastMessage.data,
-              created_at: new Date().toISOString(),
-            },
-            ...prev,
-          ]);
+      // Batched frames carry an array of notifications
+      const handleData = (data: any) => {
+        if (typeof data.seq === "number") {
+          lastSeq.current = data.seq;
+        }
+        if (data.action === "ping") {
+          // Heartbeat: sockets that stop answering are closed by the server
+          sendMessage(JSON.stringify({ action: "pong" }));
+          return;
+        }
+        if (data.action === "session") {
+          // Too much was missed to replay, reload instead
+          if (data.resync) {
+            fetchData();
+          }
+          return;
         }
+        // Notification for the current user
+        if (data.from === username) {
+          return;
+        }
+        if (data.user_id === Number(user_id)) {
+          if (data.action !== "unlike") {
+            setUnreadMessages((prev) => prev + 1);
+            setNotifications((prev) => [
+              {
+                id: data.seq ?? Date.now(),
+                user_id: data.user_id,
+                message: JSON.stringify(data),
+                created_at: new Date().toISOString(),
+              },
+              ...prev,
+            ]);
+          }
 
-        if (data.action === "like" && !openNotificationModal) {
-          openNotification(`${data.from} liked your post!`, "topRight");
-        } else if (
-          data.action === "comment" &&
-          !openNotificationModal &&
-          item?.id !== data.post_id
-        ) {
-          const contentPreview =
-            data.content.length > 50
-              ? `${data.content.substring(0, 50)}...`
-              : data.content;
-          openNotification(
-            `${data.from} commented on your post: ${contentPreview}`,
-            "topRight"
-          );
+          if (data.action === "like" && !openNotificationModal) {
+            openNotification(
+              data.count > 1 ? `${data.content}!` : `${data.from} liked your post!`,
+              "topRight"
+            );
+          } else if (
+            data.action === "comment" &&
+            !openNotificationModal &&
+            item?.id !== data.post_id
+          ) {
+            const contentPreview =
+              data.content.length > 50
+                ? `${data.content.substring(0, 50)}...`
+                : data.content;
+            openNotification(
+              `${data.from} commented on your post: ${contentPreview}`,
+              "topRight"
+            );
+          }
         }
-      }
 
-      // Logic for handling the new message
-      if (data.action === "like") {
-        setPosts((prev) => {
-          return prev.map((post) => {
-            if (post.id === data.post_id) {
-              return {
-                ...post,
-                total_likes: post.total_likes + 1,
-              };
-            }
-            return post;
+        // Logic for handling the new message
+        if (data.action === "like") {
+          setPosts((prev) => {
+            return prev.map((post) => {
+              if (post.id === data.post_id) {
+                return {
+                  ...post,
+                  total_likes: post.total_likes + (data.count ?? 1),
+                };
+              }
+              return post;
+            });
           });
-        });
-      } else if (data.action === "unlike") {
-        setPosts((prev) => {
-          return prev.map((post) => {
-            if (post.id === data.post_id) {
-              return {
-                ...post,
-                total_likes: post.total_likes - 1,
-              };
-            }
-            return post;
+        } else if (data.action === "unlike") {
+          setPosts((prev) => {
+            return prev.map((post) => {
+              if (post.id === data.post_id) {
+                return {
+                  ...post,
+                  total_likes: post.total_likes - (data.count ?? 1),
+                };
+              }
+              return post;
+            });
           });
-        });
-      } else if (data.action === "comment") {
-        setPosts((prev) => {
-          return prev.map((post) => {
-            if (post.id === data.post_id) {
-              return {
-                ...post,
-                total_comments: post.total_comments + 1,
-              };
-            }
-            return post;
+        } else if (data.action === "comment") {
+          setPosts((prev) => {
+            return prev.map((post) => {
+              if (post.id === data.post_id) {
+                return {
+                  ...post,
+                  total_comments: post.total_comments + 1,
+                };
+              }
+              return post;
+            });
           });
-        });
-        if (Number(postIdSelected) === data.post_id && comments.length > 0) {
-          setComments((prev) => [
-            {
-              id: Date.now(),
-              content: data.content,
-              username: data.from,
-              created_at: data.created_at,
-            },
-            ...prev,
-          ]);
+          if (Number(postIdSelected) === data.post_id && comments.length > 0) {
+            setComments((prev) => [
+              {
+                id: Date.now(),
+                content: data.content,
+                username: data.from,
+                created_at: data.created_at,
+              },
+              ...prev,
+            ]);
+          }
         }
-      }
+      };
+      const parsed = JSON.parse(lastMessage.data);
+      (Array.isArray(parsed) ? parsed : [parsed]).forEach(handleData);
     }
   }, [lastMessage]);
 
@@ -193,6 +232,7 @@ const Home = () => {
       setLoading(true);
       const response = await api.get("/posts");
       setPosts(response.data);
+      setPostsCursor(nextCursor(response));
     } catch (error) {
       if (axios.isAxiosError(error) && error.response?.status === 401) {
         localStorage.removeItem("token");
@@ -208,6 +248,18 @@ const Home = () => {
     fetchData();
   }, [fetchData]);
 
+  const loadMorePosts = async () => {
+    try {
+      const response = await api.get("/posts", {
+        params: { cursor: postsCursor },
+      });
+      setPosts((prev) => [...prev, ...response.data]);
+      setPostsCursor(nextCursor(response));
+    } catch (error) {
+      message.error("Failed to load posts: " + error);
+    }
+  };
+
   const toggleModal = () => {
     setIsModalVisible(!isModalVisible);
   };
@@ -276,12 +328,25 @@ const Home = () => {
       setPostIdSelected(postId);
       const response = await api.get(`/comments/${postId}`);
       setComments(response.data);
+      setCommentsCursor(nextCursor(response));
       setIsCommentModalVisible(true);
     } catch (error) {
       message.error("Failed to load comments: " + error);
     }
   };
 
+  const loadMoreComments = async () => {
+    try {
+      const response = await api.get(`/comments/${postIdSelected}`, {
+        params: { cursor: commentsCursor },
+      });
+      setComments((prev) => [...prev, ...response.data]);
+      setCommentsCursor(nextCursor(response));
+    } catch (error) {
+      message.error("Failed to load comments: " + error);
+    }
+  };
+
   const handleAddComment = async (comment: string) => {
     try {
       if (item) {
@@ -303,7 +368,7 @@ const Home = () => {
           if (post.id === item?.id) {
             return {
               ...post,
-              total_comments: comments.length + 1,
+              total_comments: post.total_comments + 1,
             };
           }
           return post;
@@ -322,10 +387,23 @@ const Home = () => {
     try {
       const response = await api.get(`/notifications/`);
       setNotifications(response.data);
+      setNotificationsCursor(nextCursor(response));
     } catch (error) {
       message.error("Failed to load comments: " + error);
     }
   };
+
+  const loadMoreNotifications = async () => {
+    try {
+      const response = await api.get(`/notifications/`, {
+        params: { cursor: notificationsCursor },
+      });
+      setNotifications((prev) => [...prev, ...response.data]);
+      setNotificationsCursor(nextCursor(response));
+    } catch (error) {
+      message.error("Failed to load notifications: " + error);
+    }
+  };
   const styles = {
     section: {
       alignItems: "center",
@@ -362,6 +440,8 @@ const Home = () => {
         notifications={notifications}
         setNotifications={setNotifications}
         handleNotification={handleNotification}
+        hasMoreNotifications={notificationsCursor !== null}
+        loadMoreNotifications={loadMoreNotifications}
         openNotification={openNotificationModal}
         setOpenNotification={setOpenNotificationModal}
       />
@@ -376,15 +456,23 @@ const Home = () => {
               size="large"
               style={styles.list}
               dataSource={posts}
+              loadMore={
+                postsCursor && (
+                  <div style={{ textAlign: "center" }}>
+                    <Button onClick={loadMorePosts}>Load more</Button>
+                  </div>
+                )
+              }
               renderItem={(item: Post) => (
                 <>
                   <Card
                     key={item.id}
                     style={styles.item}
                     cover={
-                      item.image_data ? (
+                      item.image_url ? (
                         <img
-                          src={`data:image/jpeg;base64,${item.image_data}`}
+                          src={`${process.env.REACT_APP_API_URL}${item.image_url}?w=640`}
+                          loading="lazy"
                           alt={item.title}
                           style={styles.image}
                         />
@@ -497,10 +585,13 @@ const Home = () => {
               visible={isCommentModalVisible}
               onClose={() => {
                 setComments([]);
+                setCommentsCursor(null);
                 setIsCommentModalVisible(false);
                 setPostIdSelected(undefined);
               }}
               comments={comments}
+              hasMore={commentsCursor !== null}
+              onLoadMore={loadMoreComments}
               onAddComment={handleAddComment}
             />
           </>